@@ -0,0 +1,157 @@
+################################################################################
+#                                                                              #
+#  alog.py                                                                     #
+#                                                                              #
+#  This file defines AsyncLog, the leaderboard daemon's logger. Logging a      #
+#  record on the daemon's event loop just appends it to a deque; a moment      #
+#  later a callback scheduled on the loop hands the batch to a writer thread,  #
+#  which formats and writes it out, so a slow console never stalls the loop.   #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/10/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Log levels, in increasing order of severity
+DEBUG   = 10
+INFO    = 20
+WARNING = 30
+ERROR   = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+# Level names padded to a common width for text lines
+LEVEL_LABELS = {level: f"{name:<7}" for level, name in LEVEL_NAMES.items()}
+
+# Seconds records are collected before a batch is written
+FLUSH_DELAY = 0.05
+
+# Most records held before the oldest are dropped
+MAX_RECORDS = 10000
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+AsyncLog class
+
+Collects structured log records, each a timestamp, level, message, and keyword
+fields such as the client address or room, and writes them in batches. A record
+below the configured level costs one comparison. Otherwise it is appended as a
+tuple, and the first record of a batch schedules a flush FLUSH_DELAY seconds
+later on the running event loop; no locks are involved. The flush only swaps
+out the batch and hands it to a single writer thread, which formats it as text
+lines, or as JSON lines if fmt is "json", and writes it with a single call, so
+batches are written in order and a full pipe or slow terminal blocks the thread
+rather than the loop. flush() returns the Future of the write. When no loop is
+running, such as during startup and shutdown, records are written straight
+away, along with any left waiting by a flush scheduled on a loop which has
+since stopped, and flush() waits for the write. At most maxsize records wait
+for a flush; beyond that the oldest are dropped and counted.
+"""
+class AsyncLog:
+    def __init__(self, level=INFO, fmt="text", stream=None,
+                 maxsize=MAX_RECORDS):
+        self.level = level
+        self.maxsize = maxsize
+        self.fmt = fmt
+        self.stream = stream if stream is not None else sys.__stdout__
+        self.records = deque(maxlen=maxsize)
+        self.dropped = 0
+        self._scheduled = None
+        self._second = None
+        self._stamp = ""
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix="alog")
+
+    def __len__(self):
+        return len(self.records)
+
+    def debug(self, msg, **fields):
+        if self.level <= DEBUG:
+            self._emit(DEBUG, msg, fields)
+
+    def info(self, msg, **fields):
+        if self.level <= INFO:
+            self._emit(INFO, msg, fields)
+
+    def warning(self, msg, **fields):
+        if self.level <= WARNING:
+            self._emit(WARNING, msg, fields)
+
+    def error(self, msg, **fields):
+        if self.level <= ERROR:
+            self._emit(ERROR, msg, fields)
+
+    def flush(self):
+        self._scheduled = None
+        if not self.records and not self.dropped:
+            return None
+        records, dropped = self.records, self.dropped
+        self.records = deque(maxlen=self.maxsize)
+        self.dropped = 0
+        future = self._executor.submit(self._write, records, dropped)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            future.result()
+        return future
+
+    def _emit(self, level, msg, fields):
+        if len(self.records) >= self.maxsize:
+            self.dropped += 1
+        self.records.append((time.time(), level, msg, fields))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        # A flush scheduled on another loop may never run, so schedule anew
+        if self._scheduled is loop:
+            return
+        self._scheduled = loop
+        loop.call_later(FLUSH_DELAY, self.flush)
+
+    def _write(self, records, dropped):
+        lines = [self._format(record) for record in records]
+        if dropped:
+            lines.insert(0, self._format((time.time(), WARNING,
+                                          "Log records dropped",
+                                          {"count": dropped})))
+        try:
+            self.stream.write("\n".join(lines) + "\n")
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass
+
+    def _format(self, record):
+        when, level, msg, fields = record
+        second = int(when)
+        if second != self._second:
+            self._second = second
+            self._stamp = datetime.fromtimestamp(second).isoformat()
+        stamp = f"{self._stamp}.{int((when - second) * 1000):03d}"
+        if self.fmt == "json":
+            return json.dumps({"time": stamp, "level": LEVEL_NAMES[level],
+                               "msg": msg, **fields}, default=str)
+        if not fields:
+            return f"{stamp} {LEVEL_LABELS[level]} {msg}"
+        pairs = " ".join([f"{k}={v}" for k, v in fields.items()])
+        return f"{stamp} {LEVEL_LABELS[level]} {msg} {pairs}"
@@ -0,0 +1,174 @@
+################################################################################
+#                                                                              #
+#  cluster.py                                                                  #
+#                                                                              #
+#  This file defines how the leaderboard daemon runs as several processes for  #
+#  a large event. One coordinator process holds the authoritative room state   #
+#  and the journal, and starts worker processes which share the client port    #
+#  and do the fan-out to clients. Workers forward every change they receive    #
+#  to the coordinator, which applies it and publishes the result to all        #
+#  workers in a single order, so every room sees the same leaderboard.         #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/12/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+import json
+import time
+
+import protocol
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Seconds before a worker process which exited is started again, doubled for
+# each exit in a row that comes soon after a start, up to the most given
+RESPAWN_DELAY     = 1.0
+MAX_RESPAWN_DELAY = 30.0
+
+# Seconds a worker must run for its exit not to count as a failure to start,
+# and failures to start in a row after which the worker is given up on
+QUICK_EXIT      = 5.0
+MAX_QUICK_EXITS = 5
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Coordinator class
+
+The coordinator's end of the links to its workers. Workers connect over the
+loopback interface and talk in newline delimited JSON. A new worker is first
+sent a commit message holding every room, from the snapshot() callable, and
+after that every commit published. Because the snapshot is written and the
+worker added to the set in one step of the event loop, it cannot miss or repeat
+a commit. Messages from workers are handed to handle(msg, addr). supervise()
+runs the worker processes, starting each again if it exits. A worker which
+exits soon after starting waits twice as long as the last time before it is
+started again, and one which does so MAX_QUICK_EXITS times in a row is given up
+on, so that a worker which cannot start does not spin. supervise() returns once
+every worker has been given up on.
+"""
+class Coordinator:
+    def __init__(self, snapshot, handle, log):
+        self.snapshot = snapshot
+        self.handle = handle
+        self.log = log
+        self.workers = set()
+        self.port = None
+
+    async def start(self, host):
+        server = await asyncio.start_server(self._handle_worker, host, 0)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    def publish(self, seq, records):
+        if self.workers:
+            line = encode_commit(seq, records)
+            for writer in self.workers:
+                writer.write(line)
+
+    async def supervise(self, argvs):
+        await asyncio.gather(*(self._run_worker(argv) for argv in argvs))
+
+    async def _run_worker(self, argv):
+        delay = RESPAWN_DELAY
+        quick = 0
+        while True:
+            started = time.monotonic()
+            proc = await asyncio.create_subprocess_exec(*argv)
+            try:
+                code = await proc.wait()
+            except asyncio.CancelledError:
+                proc.terminate()
+                await proc.wait()
+                raise
+            self.log.error("Worker exited", pid=proc.pid, code=code)
+            if time.monotonic() - started < QUICK_EXIT:
+                quick += 1
+                if quick >= MAX_QUICK_EXITS:
+                    self.log.error("Giving up on worker", pid=proc.pid,
+                                   exits=quick)
+                    return
+            else:
+                quick = 0
+                delay = RESPAWN_DELAY
+            await asyncio.sleep(delay)
+            if quick:
+                delay = min(delay * 2, MAX_RESPAWN_DELAY)
+
+    async def _handle_worker(self, reader, writer):
+        addr = writer.get_extra_info('peername')
+        writer.write(encode_commit(*self.snapshot()))
+        self.workers.add(writer)
+        self.log.info("Worker connected", addr=addr)
+        try:
+            while line := await reader.readline():
+                self.handle(json.loads(line), addr)
+        except Exception as e:
+            self.log.error("Error handling worker", addr=addr, error=e)
+        finally:
+            self.workers.discard(writer)
+            writer.close()
+            self.log.info("Worker disconnected", addr=addr)
+
+
+"""
+Upstream class
+
+A worker's link to its coordinator. register(), progress(), and reset() forward
+a room registration, a progress update, or a room reset without waiting for a
+reply; the change comes back as a commit once the coordinator has applied it.
+commits() yields each (seq, rooms) commit in the coordinator's order, where
+rooms is a list of (name, step, pins, rev, updated) entries, and ends when the
+link is lost.
+"""
+class Upstream:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host, port):
+        return cls(*await asyncio.open_connection(host, port))
+
+    def register(self, name, pins):
+        self.writer.write(protocol.encode({"type": "register", "room": name,
+                                           "pins": pins}))
+
+    def progress(self, room, step):
+        self.writer.write(protocol.encode({"type": "progress_update",
+                                           "room": room, "step": step}))
+
+    def reset(self, room):
+        self.writer.write(protocol.encode({"type": "reset", "room": room}))
+
+    async def commits(self):
+        try:
+            while line := await self.reader.readline():
+                msg = json.loads(line)
+                yield msg["seq"], msg["rooms"]
+        finally:
+            self.writer.close()
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+encode_commit(seq, records)
+
+Encodes registry records, changed at the given seq, as a commit message for the
+workers. Records are sent without their index, which is local to each process.
+"""
+def encode_commit(seq, records):
+    return protocol.encode({"type": "commit", "seq": seq,
+                            "rooms": [record[1:] for record in records]})
@@ -0,0 +1,100 @@
+################################################################################
+#                                                                              #
+#  codec_bench.py                                                              #
+#                                                                              #
+#  This file is a micro-benchmark comparing the JSON and binary codecs of the  #
+#  leaderboard protocol. For a registry of the given size it times encoding    #
+#  and decoding single room deltas and full snapshots with each codec, and     #
+#  reports the size of each message on the wire.                               #
+#                                                                              #
+#  Usage: python3 codec_bench.py [--rooms N] [--iterations N]                  #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   05/27/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import json
+import time
+import timeit
+
+from protocol import CODECS, FRAME, decode_frame
+from rooms import RoomRegistry
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+make_registry(count)
+
+Builds a registry of count rooms which have all made some progress.
+"""
+def make_registry(count):
+    registry = RoomRegistry()
+    now = time.time()
+    for i in range(count):
+        name = f"ROOM{i}"
+        registry.register(name, 4)
+        registry.update(name, i % 5, now)
+    return registry
+
+
+"""
+decoder(codec, names)
+
+Returns a function which decodes one message encoded by the given codec.
+"""
+def decoder(codec, names):
+    if codec.name == "json":
+        return json.loads
+    return lambda data: decode_frame(data[FRAME.size:], names)
+
+
+"""
+bench(fn, iterations)
+
+Times fn over the given number of iterations and returns microseconds per call.
+"""
+def bench(fn, iterations):
+    return min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e6
+
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard codec benchmark")
+    parser.add_argument("--rooms", type=int, default=2,
+                        help="number of rooms in the registry")
+    parser.add_argument("--iterations", type=int, default=20000,
+                        help="calls timed per measurement")
+    args = parser.parse_args()
+
+    registry = make_registry(args.rooms)
+    records = registry.records()
+    changed = registry.records([0])
+    names = dict(enumerate(registry.names))
+    print(f"{args.rooms} rooms, {args.iterations} iterations per measurement")
+    print(f"{'codec':<8}{'message':<10}{'bytes':>8}{'encode us':>12}"
+          f"{'decode us':>12}")
+    for codec in CODECS.values():
+        decode = decoder(codec, names)
+        for label, encode in (
+                ("delta", lambda: codec.delta(registry.seq, changed)),
+                ("snapshot", lambda: codec.snapshot(registry.seq, records))):
+            data = encode()
+            enc = bench(encode, args.iterations)
+            dec = bench(lambda: decode(data), args.iterations)
+            print(f"{codec.name:<8}{label:<10}{len(data):>8}{enc:>12.2f}"
+                  f"{dec:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,8 +4,8 @@
 #                                                                              #
 #  This file defines a daemon for the escape room leaderboard application      #
 #  which runs in the background on the escape room EC2 instance. It handles    #
-#  the shared state between the two rooms in order to provide progress bars    #
-#  to each room in the client applications to show a realtime leaderboard.     #
+#  the shared state between the rooms in order to provide progress bars to     #
+#  each room in the client applications to show a realtime leaderboard.        #
 #                                                                              #
 #  Author: Edward Speer                                                        #
 #  Date:   04/21/2025                                                          #
@@ -16,11 +16,24 @@
 #  IMPORTS                                                                     #
 ################################################################################
 
+import argparse
 import asyncio
-import json
-from datetime import datetime
+import os
+import signal
+import socket
+import sys
+import time
 
-from print_util import PrintQ
+import protocol
+import alog
+import cluster
+from history import History, HISTORY_FILE
+from journal import Journal, STATE_DIR
+from metrics import METRICS
+from peer import Peer
+from ratelimit import TokenBucket
+from rooms import RoomRegistry, DEFAULT_PINS, MAX_ROOMS
+from spectator import Spectator
 
 ################################################################################
 #  CONSTANTS                                                                   #
@@ -29,24 +42,103 @@ from print_util import PrintQ
 # The address to the local loopback interface
 LO = '127.0.0.1'
 
+# Signals which stop the daemon cleanly, closing its journal and history
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
 # The port for the server to listen on
 PORT = 5000
 
+# The rooms registered before any client connects
+DEFAULT_ROOMS = ["A", "B"]
+
+# The loopback port serving metrics, and seconds between metric dumps
+METRICS_PORT     = 5001
+METRICS_INTERVAL = 60
+
+# The loopback port serving the leaderboard to lobby screens
+SPECTATOR_PORT = 5002
+
+# Messages per second each client may send on average, and in a burst
+RATE_LIMIT = 50
+RATE_BURST = 100
+
+# Longest message accepted from a client, in bytes, as a line or a frame
+MAX_MESSAGE = 16384
+
+# Seconds between heartbeats to idle clients, and of silence before a client
+# that should have answered them is dropped
+PING_INTERVAL = 15
+DEAD_AFTER    = 45
+
+# TCP keepalive on client sockets: seconds idle before the first probe, seconds
+# between probes, and unanswered probes before the connection is dropped
+KEEPALIVE_IDLE     = 60
+KEEPALIVE_INTERVAL = 10
+KEEPALIVE_COUNT    = 6
+
 ################################################################################
 #  GLOBALS                                                                     #
 ################################################################################
 
 # The current status of each room and when it was last updated
-STATE = {
-    "A": {"step": 0, "last_updated": None},
-    "B": {"step": 0, "last_updated": None},
-}
+ROOMS = RoomRegistry()
+
+# Encoded snapshots of ROOMS at ROOMS.seq, keyed by version and codec name
+SNAPSHOTS = {}
 
-# The set of connected client applications—should total 2
+# The set of connected client Peers
 CLIENTS = set()
 
-# Printing queue for non-blocking printing
-PRINTQ = PrintQ()
+# Peers subscribed to every room, which includes all version 1 clients
+WILDCARD = set()
+
+# Peers subscribed to each room, indexed by the room's registry index
+SUBSCRIBERS = []
+
+# Rate and burst of each client's token bucket, or None for no limit
+RATE = (RATE_LIMIT, RATE_BURST)
+
+# Write-ahead journal of room changes, or None when persistence is disabled
+JOURNAL = None
+
+# Record of every progress update, or None when persistence is disabled
+HISTORY = None
+
+# The coordinator of the worker processes, when this process is one
+COORDINATOR = None
+
+# The link to the coordinator, when this process is one of its workers
+UPSTREAM = None
+
+# Log sink flushed in batches on the event loop
+LOG = alog.AsyncLog()
+
+################################################################################
+#  METRICS                                                                     #
+################################################################################
+
+RECEIVED       = METRICS.counter("messages_received")
+DECODE_ERRORS  = METRICS.counter("decode_errors")
+INVALID        = METRICS.counter("messages_invalid")
+RATE_LIMITED   = METRICS.counter("messages_rate_limited")
+REAPED         = METRICS.counter("peers_reaped")
+BROADCAST_TIME = METRICS.histogram("broadcast_fanout_seconds")
+METRICS.gauge("clients_connected", lambda: len(CLIENTS))
+METRICS.gauge("rooms_registered", lambda: len(ROOMS))
+METRICS.gauge("peers_pending",
+              lambda: sum(peer.pending is not None for peer in CLIENTS))
+METRICS.gauge("peer_write_buffer_bytes",
+              lambda: sum(peer.writer.transport.get_write_buffer_size()
+                          for peer in CLIENTS))
+METRICS.gauge("journal_buffered",
+              lambda: len(JOURNAL.buffer) if JOURNAL is not None else 0)
+METRICS.gauge("workers_connected",
+              lambda: len(COORDINATOR.workers) if COORDINATOR else 0)
+METRICS.gauge("history_buffered",
+              lambda: HISTORY.count - HISTORY.flushed if HISTORY else 0)
+METRICS.gauge("history_dropped", lambda: HISTORY.dropped if HISTORY else 0)
+METRICS.gauge("log_buffered", lambda: len(LOG))
+METRICS.gauge("log_dropped", lambda: LOG.dropped)
 
 ################################################################################
 #  FUNCTIONS                                                                   #
@@ -56,72 +148,563 @@ PRINTQ = PrintQ()
 handle_client(reader, writer)
 
 For each client application connected from each of the escape rooms, monitors
-the client's progress and maintains the shared state between the two rooms.
+the client's progress and maintains the shared state between the rooms. A
+version 2 client's hello may name its own room and pin count, which registers
+the room, and the list of rooms it wants updates for. Steps only move forward,
+so a progress update at or below a room's current step is a replay from a
+reconnecting client and is ignored. A client starting afresh for a new team
+sets reset in its first hello, which moves its room back to step 0. Messages
+beyond the client's rate limit are dropped, as are messages which fail
+validation, before any work is done for them; only a message too long or too
+garbled to read closes the connection.
+Every message, including a pong, counts as a sign of life for the reaper.
 """
 async def handle_client(reader, writer):
-    addr = writer.get_extra_info('peername')
-    CLIENTS.add(writer)
-    PRINTQ.put(f"Client connected from {addr}")
+    enable_keepalive(writer.get_extra_info('socket'))
+    peer = Peer(writer, snapshot_payload)
+    addr = peer.addr
+    CLIENTS.add(peer)
+    WILDCARD.add(peer)
+    LOG.info("Client connected", addr=addr)
+    bucket = TokenBucket(*RATE) if RATE is not None else None
+    limited = 0
 
     try:
         while True:
-            data = await reader.readline()
-            if not data:
+            try:
+                msg = await protocol.read_message(reader, None, MAX_MESSAGE)
+            except (ValueError, UnicodeDecodeError, IndexError):
+                DECODE_ERRORS.inc()
+                raise
+            if msg is None:
                 break
-            msg = json.loads(data.decode())
+            RECEIVED.inc()
+            peer.last_seen = time.monotonic()
+            if bucket is not None and not bucket.take():
+                RATE_LIMITED.inc()
+                limited += 1
+                continue
+            try:
+                protocol.validate(msg)
+                if msg["type"] == "progress_update":
+                    check_step(msg["room"], msg["step"])
+                    check_rooms([msg["room"]])
+                elif msg["type"] == "hello":
+                    check_rooms([msg["room"]] if msg.get("room") else [],
+                                msg.get("subscribe"))
+            except ValueError as e:
+                INVALID.inc()
+                LOG.warning("Invalid message", addr=addr, error=e)
+                continue
 
             if msg["type"] == "progress_update":
-                room = msg["room"]
-                step = msg["step"]
-                STATE[room]["step"] = step
-                STATE[room]["last_updated"] = datetime.now().isoformat()
+                progress_update(msg["room"], msg["step"], addr)
 
-                await broadcast_state()
+            elif msg["type"] == "hello":
+                peer.version = min(msg["version"], protocol.PROTOCOL_VERSION)
+                peer.codec = protocol.CODECS.get(msg.get("codec"), peer.codec)
+                if msg.get("room") is not None:
+                    register_room(msg["room"], msg.get("pins"))
+                    if msg.get("reset"):
+                        reset_room(msg["room"], addr)
+                subscribe(peer, msg.get("subscribe"))
+                peer.request_snapshot()
+
+            elif msg["type"] == "resync":
+                peer.request_snapshot()
 
     except Exception as e:
-        PRINTQ.put(f"Error handling client {addr}: {e}")
+        LOG.error("Error handling client", addr=addr, error=e)
 
     finally:
-        CLIENTS.remove(writer)
+        if limited:
+            LOG.warning("Rate limited client", addr=addr, dropped=limited)
+        unsubscribe(peer)
+        CLIENTS.discard(peer)
+        peer.close()
+        if peer.error is not None:
+            LOG.warning("Dropped client", addr=addr, error=peer.error)
         writer.close()
-        await writer.wait_closed()
-        PRINTQ.put(f"Client disconnected from {addr}")
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
+        LOG.info("Client disconnected", addr=addr)
+
+"""
+enable_keepalive(sock)
+
+Turns on TCP keepalive for a client socket, so that the kernel notices a peer
+which vanished without closing its connection even if the client never answers
+heartbeats, as with version 1 clients. The timing options are set where the
+platform supports them.
+"""
+def enable_keepalive(sock):
+    if sock is None:
+        return
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+                          ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+                          ("TCP_KEEPCNT", KEEPALIVE_COUNT)):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+"""
+reap_peers(interval, dead_after)
+
+Every interval seconds, pings each version 2 client the daemon has not heard
+from for an interval, and drops any version 2 client that has been silent for
+dead_after seconds. Aborting the transport ends the client's handle_client,
+which removes it from every set. Version 1 clients cannot answer pings and are
+left to TCP keepalive and the send timeout.
+"""
+async def reap_peers(interval, dead_after):
+    while True:
+        await asyncio.sleep(interval)
+        now = time.monotonic()
+        for peer in list(CLIENTS):
+            if peer.version == protocol.LEGACY_VERSION:
+                continue
+            idle = now - peer.last_seen
+            if idle >= dead_after:
+                REAPED.inc()
+                LOG.warning("Reaping silent client", addr=peer.addr,
+                            idle=round(idle, 1))
+                peer.writer.transport.abort()
+            elif idle >= interval:
+                peer.ping()
+
+"""
+check_step(room, step)
+
+Raises ValueError if step is past the last pin of the room, taking a room that
+is not yet registered to have DEFAULT_PINS pins.
+"""
+def check_step(room, step):
+    idx = ROOMS.index.get(room)
+    pins = DEFAULT_PINS if idx is None else ROOMS.pins[idx]
+    if step > pins:
+        raise ValueError(f"step {step} is past the {pins} pins of room {room}")
+
+"""
+check_rooms(*names)
+
+Raises ValueError if the rooms in the given lists of names, any of which may be
+None, would take the registry past MAX_ROOMS.
+"""
+def check_rooms(*names):
+    new = {name for group in names for name in group or () if name not in ROOMS}
+    if len(ROOMS) + len(new) > MAX_ROOMS:
+        raise ValueError(f"more than {MAX_ROOMS} rooms")
+
+"""
+progress_update(room, step, addr)
+
+Moves a room to the given step, registering the room if it is new. Steps only
+move forward, so a step at or below the room's current step is ignored. A
+worker forwards the update to its coordinator instead of applying it, and the
+coordinator checks the step again against the authoritative state, ignoring it
+if it is past the room's last pin. Applied updates are added to the history.
+"""
+def progress_update(room, step, addr):
+    idx = register_room(room)
+    if not ROOMS.steps[idx] < step <= ROOMS.pins[idx]:
+        return
+    if UPSTREAM is not None:
+        UPSTREAM.progress(room, step)
+        return
+    ROOMS.update(room, step)
+    LOG.debug("Progress", addr=addr, room=room, step=step)
+    if HISTORY is not None:
+        HISTORY.record(room, step, ROOMS.updated[idx])
+    commit([idx])
+
+"""
+reset_room(room, addr)
+
+Moves a room back to step 0 for a new team, so that its first progress update
+is accepted again. The reset is added to the history even if the room was
+already at step 0, marking the time the team started. A worker forwards the
+reset to its coordinator instead of applying it.
+"""
+def reset_room(room, addr):
+    idx = register_room(room)
+    if UPSTREAM is not None:
+        UPSTREAM.reset(room)
+        return
+    LOG.info("Room reset", addr=addr, room=room, step=ROOMS.steps[idx])
+    if ROOMS.steps[idx]:
+        ROOMS.update(room, 0)
+        commit([idx])
+    if HISTORY is not None:
+        HISTORY.record(room, 0, time.time())
+
+"""
+register_room(name, pins)
+
+Adds a room to the registry, or changes the pin count of a known room, and
+commits the room's entry if anything changed. A worker reserves an index for a
+new room so that peers can subscribe to it at once, and leaves the registration
+itself to the coordinator.
+"""
+def register_room(name, pins=None):
+    if UPSTREAM is not None:
+        idx = ROOMS.index.get(name)
+        if (idx is None or not ROOMS.revs[idx] or
+                pins not in (None, ROOMS.pins[idx])):
+            UPSTREAM.register(name, pins)
+        idx, changed = ROOMS.reserve(name, pins), False
+    else:
+        idx, changed = ROOMS.register(name, pins)
+    if idx == len(SUBSCRIBERS):
+        SUBSCRIBERS.append(set())
+    if changed:
+        if ROOMS.revs[idx] == 1:
+            LOG.info("Registered room", room=name, pins=ROOMS.pins[idx])
+        commit([idx])
+    return idx
+
+"""
+watch_room(name)
+
+Returns the index of a room for a subscription, reserving a placeholder for a
+room that is not yet known. The placeholder is not committed, journaled, or
+broadcast, so subscribing alone never creates a room; it becomes one once a
+client registers it or reports progress in it.
+"""
+def watch_room(name):
+    idx = ROOMS.reserve(name)
+    if idx == len(SUBSCRIBERS):
+        SUBSCRIBERS.append(set())
+    return idx
+
+"""
+subscribe(peer, names)
+
+Routes updates for the named rooms to the peer, watching any room that is not
+yet known. A names value of None subscribes the peer to every room.
+"""
+def subscribe(peer, names):
+    unsubscribe(peer)
+    if names is None:
+        peer.rooms = None
+        WILDCARD.add(peer)
+        return
+    peer.rooms = [watch_room(name) for name in names]
+    for idx in peer.rooms:
+        SUBSCRIBERS[idx].add(peer)
+
+"""
+unsubscribe(peer)
+
+Removes the peer from every subscription set it belongs to.
+"""
+def unsubscribe(peer):
+    WILDCARD.discard(peer)
+    for idx in peer.rooms or ():
+        SUBSCRIBERS[idx].discard(peer)
+
+"""
+commit(changed)
+
+Records a change to the rooms at the given indices in the journal, if any, and
+broadcasts it to the interested clients, including through any workers. The
+journal only buffers the change here; it reaches the disk in the background.
+"""
+def commit(changed):
+    if JOURNAL is not None:
+        for idx in changed:
+            JOURNAL.append(ROOMS.seq, ROOMS.record(idx))
+    if COORDINATOR is not None:
+        COORDINATOR.publish(ROOMS.seq, ROOMS.records(changed))
+    broadcast_state(changed)
+
+"""
+apply_commit(seq, rooms)
+
+Applies a commit published by the coordinator to a worker's copy of the rooms
+and broadcasts it to the worker's clients.
+"""
+def apply_commit(seq, rooms):
+    changed = [ROOMS.restore(*room) for room in rooms]
+    ROOMS.seq = seq
+    SUBSCRIBERS.extend(set() for _ in range(len(ROOMS) - len(SUBSCRIBERS)))
+    if changed:
+        broadcast_state(changed)
+
+"""
+handle_worker_message(msg, addr)
+
+Applies a change forwarded by a worker to the coordinator's rooms. A change
+the coordinator cannot apply, such as a new room past MAX_ROOMS, is dropped
+without losing the link to the worker.
+"""
+def handle_worker_message(msg, addr):
+    try:
+        if msg["type"] == "progress_update":
+            progress_update(msg["room"], msg["step"], addr)
+        elif msg["type"] == "register":
+            register_room(msg["room"], msg.get("pins"))
+        elif msg["type"] == "reset":
+            reset_room(msg["room"], addr)
+    except ValueError as e:
+        LOG.warning("Invalid worker message", addr=addr, error=e)
+
+"""
+broadcast_state(changed)
 
+Broadcasts a change to the shared state of the rooms to the interested clients.
+Will be called whenever the state is updated by any client, with the indices of
+the rooms which changed. The change is captured once as an Update, encoded at
+most once per codec, and offered to every peer subscribed to one of those rooms,
+whose sender task delivers it in the background so that one slow room cannot
+hold up the others.
 """
-broadcast_state()
+def broadcast_state(changed):
+    start = time.perf_counter()
+    SNAPSHOTS.clear()
+    delta = protocol.Update(ROOMS.seq, ROOMS.records(changed))
+    if len(changed) == 1:
+        targets = SUBSCRIBERS[changed[0]]
+    else:
+        targets = set().union(*(SUBSCRIBERS[idx] for idx in changed))
+    for peer in targets:
+        peer.offer(delta)
+    for peer in WILDCARD:
+        peer.offer(delta)
+    BROADCAST_TIME.record(time.perf_counter() - start)
 
-Broadcasts the current shared state of the rooms to all connected clients. Will
-be called whenever the state is updated by any client.
 """
-async def broadcast_state():
-    state_json = json.dumps({"type": "state", "data": STATE}) + "\n"
-    for client in CLIENTS:
+snapshot_payload(version, codec)
+
+Returns the full state encoded for a client of the given protocol version using
+the given codec. The encoding is cached until the state next changes, so any
+number of peers falling back to a snapshot share a single serialization.
+"""
+def snapshot_payload(version, codec):
+    key = (version, codec.name)
+    payload = SNAPSHOTS.get(key)
+    if payload is None:
+        if version == protocol.LEGACY_VERSION:
+            payload = protocol.CODECS["json"].state(ROOMS.records())
+        else:
+            payload = codec.snapshot(ROOMS.seq, ROOMS.records())
+        SNAPSHOTS[key] = payload
+    return payload
+
+"""
+parse_args()
+
+Parses the daemon's command line options.
+"""
+def parse_args():
+    parser = argparse.ArgumentParser(description="Escape room leaderboard daemon")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help="port to listen on")
+    parser.add_argument("--rooms", default=",".join(DEFAULT_ROOMS),
+                        help="comma separated rooms to register at startup")
+    parser.add_argument("--pins", type=int, default=DEFAULT_PINS,
+                        help="pin count of the startup rooms")
+    parser.add_argument("--state-dir", default=STATE_DIR,
+                        help="directory to persist room state in")
+    parser.add_argument("--no-persist", action="store_true",
+                        help="keep room state in memory only")
+    parser.add_argument("--reset", action="store_true",
+                        help="discard the persisted rooms and start fresh, "
+                             "keeping the history")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="loopback port serving metrics, 0 to disable")
+    parser.add_argument("--metrics-interval", type=float,
+                        default=METRICS_INTERVAL,
+                        help="seconds between metric dumps, 0 to disable")
+    parser.add_argument("--spectator-port", type=int, default=SPECTATOR_PORT,
+                        help="loopback port serving lobby screens, 0 to "
+                             "disable")
+    parser.add_argument("--rate-limit", type=float, default=RATE_LIMIT,
+                        help="messages per second each client may send, 0 "
+                             "for no limit")
+    parser.add_argument("--rate-burst", type=int, default=RATE_BURST,
+                        help="messages each client may send in a burst")
+    parser.add_argument("--ping-interval", type=float, default=PING_INTERVAL,
+                        help="seconds between heartbeats to idle clients, 0 "
+                             "to disable")
+    parser.add_argument("--dead-after", type=float, default=DEAD_AFTER,
+                        help="seconds of silence after which a client is "
+                             "dropped")
+    parser.add_argument("--log-level", default="info",
+                        choices=[n.lower() for n in alog.LEVEL_NAMES.values()],
+                        help="least severe log records to print")
+    parser.add_argument("--log-format", choices=["text", "json"],
+                        default="text",
+                        help="print log records as text or as JSON lines")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="worker processes sharing the port, 0 for none")
+    parser.add_argument("--coordinator", type=int, default=0,
+                        help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+"""
+open_journal(args)
+
+Opens the journal in the configured state directory and restores the rooms it
+holds, or removes them first if a reset was requested.
+"""
+def open_journal(args):
+    journal = Journal(args.state_dir)
+    if args.reset:
+        for path in (journal.snap_path, journal.log_path):
+            if os.path.exists(path):
+                os.remove(path)
+    replayed = journal.replay(ROOMS)
+    SUBSCRIBERS.extend(set() for _ in range(len(ROOMS) - len(SUBSCRIBERS)))
+    if len(ROOMS):
+        LOG.info("Restored rooms", rooms=len(ROOMS), seq=ROOMS.seq,
+                 replayed=replayed)
+    return journal
+
+"""
+worker_argv(args, worker)
+
+Builds the command line which starts a worker process of this coordinator. The
+workers listen on the daemon's port, take their rooms from the coordinator, and
+serve metrics on the ports following both the coordinator's metrics port and
+its spectator port, so that neither is taken. Spectators are served by the
+coordinator alone.
+"""
+def worker_argv(args, worker):
+    base = max(args.metrics_port, args.spectator_port)
+    metrics_port = base + 1 + worker if args.metrics_port else 0
+    return [sys.executable, os.path.abspath(__file__),
+            "--port", str(args.port), "--rooms", "", "--no-persist",
+            "--coordinator", str(COORDINATOR.port),
+            "--metrics-port", str(metrics_port),
+            "--metrics-interval", str(args.metrics_interval),
+            "--spectator-port", "0",
+            "--rate-limit", str(args.rate_limit),
+            "--rate-burst", str(args.rate_burst),
+            "--ping-interval", str(args.ping_interval),
+            "--dead-after", str(args.dead_after),
+            "--log-level", args.log_level, "--log-format", args.log_format]
+
+"""
+follow_upstream(commits)
+
+Applies the coordinator's commits in order until the link to it is lost.
+"""
+async def follow_upstream(commits):
+    async for seq, rooms in commits:
+        apply_commit(seq, rooms)
+    LOG.error("Lost connection to coordinator")
+
+"""
+until_stopped(coro, stop)
+
+Runs coro until it finishes or the stop event is set, cancelling it in the
+latter case. Returns True if coro finished on its own, raising whatever it
+raised.
+"""
+async def until_stopped(coro, stop):
+    task = asyncio.ensure_future(coro)
+    stopped = asyncio.ensure_future(stop.wait())
+    await asyncio.wait((task, stopped), return_when=asyncio.FIRST_COMPLETED)
+    stopped.cancel()
+    if not task.done():
+        task.cancel()
         try:
-            client.write(state_json.encode())
-            await client.drain()
-        except Exception as e:
-            continue
+            await task
+        except asyncio.CancelledError:
+            pass
+        return False
+    task.result()
+    return True
 
 
 ################################################################################
 #  MAIN EXECUTABLE                                                             #
 ################################################################################
 
-async def main():
-    server = await asyncio.start_server(handle_client, LO, PORT)
-    PRINTQ.put(f"Daemon started on localhost:{PORT}")
-    async with server:
-        await server.serve_forever()
+async def main(args):
+    global JOURNAL, HISTORY, COORDINATOR, UPSTREAM, RATE
+    LOG.level = getattr(alog, args.log_level.upper())
+    LOG.fmt = args.log_format
+    RATE = (args.rate_limit, args.rate_burst) if args.rate_limit else None
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in STOP_SIGNALS:
+        loop.add_signal_handler(signum, stop.set)
+    dumper = None
+    if args.coordinator:
+        UPSTREAM = await cluster.Upstream.connect(LO, args.coordinator)
+        commits = UPSTREAM.commits()
+        apply_commit(*await anext(commits))
+    elif not args.no_persist:
+        JOURNAL = open_journal(args)
+        JOURNAL.start(ROOMS)
+        HISTORY = History(os.path.join(args.state_dir, HISTORY_FILE))
+        HISTORY.start()
+    try:
+        for name in filter(None, args.rooms.split(",")):
+            register_room(name, args.pins)
+        if args.metrics_port:
+            await METRICS.serve(LO, args.metrics_port)
+            LOG.info("Metrics served", port=args.metrics_port)
+        if args.metrics_interval:
+            dumper = asyncio.create_task(
+                METRICS.dump(args.metrics_interval,
+                             lambda text: LOG.info("Metrics\n" + text)))
+        if args.spectator_port:
+            await Spectator(ROOMS).serve(LO, args.spectator_port)
+            LOG.info("Spectators served", port=args.spectator_port)
+        if args.workers:
+            COORDINATOR = cluster.Coordinator(
+                lambda: (ROOMS.seq, ROOMS.records()), handle_worker_message,
+                LOG)
+            await COORDINATOR.start(LO)
+            LOG.info("Starting workers", workers=args.workers, port=args.port)
+            if await until_stopped(COORDINATOR.supervise(
+                    [worker_argv(args, i) for i in range(args.workers)]), stop):
+                raise RuntimeError("every worker failed to start")
+            return
+        if args.ping_interval:
+            reaper = asyncio.create_task(
+                reap_peers(args.ping_interval, args.dead_after))
+        server = await asyncio.start_server(handle_client, LO, args.port,
+                                            limit=MAX_MESSAGE,
+                                            reuse_port=UPSTREAM is not None)
+        LOG.info("Daemon started", port=args.port)
+        async with server:
+            if UPSTREAM is None:
+                await until_stopped(server.serve_forever(), stop)
+            else:
+                await until_stopped(follow_upstream(commits), stop)
+    finally:
+        if stop.is_set():
+            LOG.info("Daemon stopped")
+        if dumper is not None:
+            dumper.cancel()
+            LOG.info("Metrics\n" + METRICS.render().rstrip("\n"))
+        try:
+            if JOURNAL is not None:
+                await JOURNAL.close()
+        finally:
+            if HISTORY is not None:
+                await HISTORY.close()
+                LOG.info("History written", updates=HISTORY.flushed,
+                         dropped=HISTORY.dropped)
+            LOG.flush()
 
 
 if __name__ == "__main__":
+    code = 0
     try:
-        asyncio.run(main())
+        asyncio.run(main(parse_args()))
     except KeyboardInterrupt:
-        PRINTQ.put("Daemon stopped.")
+        LOG.info("Daemon stopped")
     except Exception as e:
-        PRINTQ.put(f"Error starting daemon: {e}")
+        LOG.error("Error starting daemon", error=e)
+        code = 1
     finally:
-        for client in CLIENTS:
-            client.close()
-        PRINTQ.put("All clients disconnected.")
+        for peer in CLIENTS:
+            peer.writer.close()
+        LOG.info("All clients disconnected")
+    sys.exit(code)
@@ -0,0 +1,467 @@
+################################################################################
+#                                                                              #
+#  history.py                                                                  #
+#                                                                              #
+#  This file records every progress update the leaderboard daemon applies,     #
+#  so that a race can be reconstructed after the event. The daemon keeps the   #
+#  newest updates in a ring buffer of typed arrays and appends them in the     #
+#  background to a compact binary file, and the Timeline class answers         #
+#  queries such as split times, time between pins, and head-to-head races      #
+#  over a loaded file. Run on its own, this file is a command line tool for    #
+#  those queries.                                                              #
+#                                                                              #
+#  Usage: python3 history.py [--file PATH] [--run N] <command> [room ...]      #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/18/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import asyncio
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# File name of the history within the daemon's state directory
+HISTORY_FILE = "history.bin"
+
+# Number of updates the ring buffer holds before the oldest are overwritten
+CAPACITY = 65536
+
+# Seconds between appends of buffered updates to the file
+FLUSH_INTERVAL = 5
+
+# First bytes of every history file
+MAGIC = b"LBH1"
+
+# Block header: a tag naming the block type and the count of what follows
+BLOCK = struct.Struct("<4sI")
+
+# Block tags: a room name, given as its length in bytes followed by the name, or
+# a run of updates, given as their count followed by the column of update times
+# (float64), the column of room ids (uint16), and the column of steps (uint16)
+T_NAME   = b"NAME"
+T_EVENTS = b"EVTS"
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+History class
+
+Records progress updates as (time, room, step) in three parallel typed arrays
+used as a ring buffer of capacity entries, with rooms stored as ids into names.
+count is the number of updates ever recorded and flushed the number written to
+path, so the updates still to be written are the last count - flushed slots of
+the ring. flush() copies them out on the event loop and appends them as one
+block, preceded by a block for each new room name, on a background thread. If
+more than capacity updates arrive between flushes, the oldest unwritten ones
+are overwritten and counted in dropped. close() writes out whatever is still
+buffered, and the daemon calls it on every way out, including SIGTERM, so that
+stopping it loses none of the updates since the last flush. Opening an existing
+file reads back its room names, so ids stay stable, and cuts off a block torn by
+a crash. Without a path the ring simply keeps the newest capacity updates.
+"""
+class History:
+    def __init__(self, path=None, capacity=CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.names = []
+        self.index = {}
+        self.times = array('d', [0.0]) * capacity
+        self.rooms = array('H', [0]) * capacity
+        self.steps = array('H', [0]) * capacity
+        self.count = 0
+        self.flushed = 0
+        self.named = 0
+        self.dropped = 0
+        self._task = None
+        self._executor = None
+        if path is not None:
+            self.names = read_names(path)
+            self.index = {name: i for i, name in enumerate(self.names)}
+            self.named = len(self.names)
+            self._executor = ThreadPoolExecutor(max_workers=1,
+                                                thread_name_prefix="history")
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def record(self, name, step, when):
+        room = self.index.get(name)
+        if room is None:
+            room = len(self.names)
+            self.names.append(name)
+            self.index[name] = room
+        if self.path is not None and self.count - self.flushed >= self.capacity:
+            self.flushed += 1
+            self.dropped += 1
+        pos = self.count % self.capacity
+        self.times[pos] = when
+        self.rooms[pos] = room
+        self.steps[pos] = step
+        self.count += 1
+
+    def timeline(self):
+        start = self.count - len(self)
+        return Timeline(list(self.names), *(
+            self._span(column, start, self.count)
+            for column in (self.times, self.rooms, self.steps)))
+
+    def start(self, interval=FLUSH_INTERVAL):
+        self._task = asyncio.create_task(self._flusher(interval))
+
+    async def flush(self):
+        if self.path is None or (self.flushed == self.count and
+                                 self.named == len(self.names)):
+            return
+        blocks = []
+        for name in self.names[self.named:]:
+            data = name.encode()
+            blocks.append(BLOCK.pack(T_NAME, len(data)) + data)
+        self.named = len(self.names)
+        if self.count > self.flushed:
+            blocks.append(BLOCK.pack(T_EVENTS, self.count - self.flushed))
+            for column in (self.times, self.rooms, self.steps):
+                blocks.append(to_le(self._span(column, self.flushed,
+                                               self.count)).tobytes())
+            self.flushed = self.count
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._append,
+                                   b"".join(blocks))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    async def _flusher(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def _span(self, column, start, end):
+        first = start % self.capacity
+        last = first + (end - start)
+        if last <= self.capacity:
+            return column[first:last]
+        return column[first:] + column[:last - self.capacity]
+
+    def _append(self, data):
+        with open(self.path, "ab") as f:
+            if f.tell() == 0:
+                f.write(MAGIC)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+"""
+Timeline class
+
+A read-only view of recorded updates in time order, held as the same parallel
+columns as History. Queries look rooms up by name and may be limited to updates
+between since and until, given as seconds since the epoch, which are found by
+binary search on the time column. The positions of each room's updates are
+gathered in a single pass the first time any room is queried, so every later
+query only touches the updates of the rooms it names.
+
+A room is played by one team after another, and runs() splits its updates into
+one run per team. A run starts at a reset, which the daemon records as an update
+to step 0 when a team starts, or wherever the step drops without one. events()
+lists (time, room, step) updates. reached() gives, for each step of a run, the
+time it was first reached. splits() gives those times relative to a start, by
+default the run's reset, or its first update if it has none, and pin_times()
+gives the time each step took after the one before it. These take the index of
+the run, the newest by default. state_at() gives the step of every room at a
+moment, and head_to_head() merges two rooms into a single race of (time, room,
+step, lead) entries, where lead is how many steps the first room is ahead of
+the second after each update.
+"""
+class Timeline:
+    def __init__(self, names, times, rooms, steps):
+        self.names = names
+        self.index = {name: i for i, name in enumerate(names)}
+        self.times = times
+        self.rooms = rooms
+        self.steps = steps
+        self._positions = None
+
+    def __len__(self):
+        return len(self.times)
+
+    def events(self, room=None, since=None, until=None):
+        if room is None:
+            lo, hi = self._range(since, until)
+            positions = range(lo, hi)
+        else:
+            positions = self._room_range(room, since, until)
+        return [(self.times[i], self.names[self.rooms[i]], self.steps[i])
+                for i in positions]
+
+    def runs(self, room, since=None, until=None):
+        runs = []
+        previous = None
+        for i in self._room_range(room, since, until):
+            step = self.steps[i]
+            if previous is None or step == 0 or step < previous:
+                runs.append(array('I'))
+            runs[-1].append(i)
+            previous = step
+        return runs
+
+    def reached(self, room, since=None, until=None, run=-1):
+        firsts = []
+        best = 0
+        for i in self._run(room, since, until, run):
+            if self.steps[i] > best:
+                best = self.steps[i]
+                firsts.append((best, self.times[i]))
+        return firsts
+
+    def splits(self, room, start=None, since=None, until=None, run=-1):
+        firsts = self.reached(room, since, until, run)
+        if not firsts:
+            return []
+        if start is None:
+            start = self.times[self._run(room, since, until, run)[0]]
+        return [(step, when - start) for step, when in firsts]
+
+    def pin_times(self, room, start=None, since=None, until=None, run=-1):
+        splits = self.splits(room, start, since, until, run)
+        previous = 0.0
+        times = []
+        for step, elapsed in splits:
+            times.append((step, elapsed - previous))
+            previous = elapsed
+        return times
+
+    def state_at(self, when):
+        state = {}
+        end = bisect_right(self.times, when)
+        for room, positions in enumerate(self._room_positions()):
+            at = bisect_left(positions, end)
+            if at:
+                state[self.names[room]] = self.steps[positions[at - 1]]
+        return state
+
+    def head_to_head(self, first, second, since=None, until=None):
+        merged = sorted(self.events(first, since, until) +
+                        self.events(second, since, until))
+        steps = {first: 0, second: 0}
+        race = []
+        for when, room, step in merged:
+            steps[room] = step
+            race.append((when, room, step, steps[first] - steps[second]))
+        return race
+
+    def _range(self, since, until):
+        lo = 0 if since is None else bisect_left(self.times, since)
+        hi = len(self.times) if until is None else bisect_right(self.times,
+                                                                until)
+        return lo, hi
+
+    def _room_positions(self):
+        if self._positions is None:
+            self._positions = [array('I') for _ in self.names]
+            for i, room in enumerate(self.rooms):
+                self._positions[room].append(i)
+        return self._positions
+
+    def _room_range(self, room, since, until):
+        if room not in self.index:
+            raise KeyError(f"No history for room {room}")
+        positions = self._room_positions()[self.index[room]]
+        lo, hi = self._range(since, until)
+        return positions[bisect_left(positions, lo):bisect_left(positions, hi)]
+
+    def _run(self, room, since, until, run):
+        runs = self.runs(room, since, until)
+        if not runs:
+            return runs
+        try:
+            return runs[run]
+        except IndexError:
+            raise KeyError(f"No run {run} for room {room}") from None
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+to_le(column)
+
+Returns a typed array in little endian byte order, as stored in history files.
+"""
+def to_le(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column
+
+
+"""
+read_blocks(path, repair)
+
+Yields (tag, count, body) for each complete block of a history file. With
+repair, which only the daemon that appends to the file may ask for, the file is
+then cut off after the last complete block so that appends follow it cleanly;
+otherwise it is only read, so a reader never cuts off a block being written.
+"""
+def read_blocks(path, repair=False):
+    if not os.path.exists(path):
+        return
+    with open(path, "r+b" if repair else "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a history file")
+        good = f.tell()
+        while True:
+            header = f.read(BLOCK.size)
+            if len(header) < BLOCK.size:
+                break
+            tag, count = BLOCK.unpack(header)
+            size = count if tag == T_NAME else count * 12
+            body = f.read(size)
+            if len(body) < size or tag not in (T_NAME, T_EVENTS):
+                break
+            good = f.tell()
+            yield tag, count, body
+        if repair:
+            f.truncate(good)
+
+
+"""
+read_names(path)
+
+Returns the room names of a history file in id order, cutting off a block torn
+by a crash so that the file can be appended to.
+"""
+def read_names(path):
+    return [body.decode() for tag, _, body in read_blocks(path, repair=True)
+            if tag == T_NAME]
+
+
+"""
+load(path)
+
+Reads a whole history file into a Timeline, leaving the file untouched.
+"""
+def load(path):
+    names = []
+    columns = (array('d'), array('H'), array('H'))
+    for tag, count, body in read_blocks(path):
+        if tag == T_NAME:
+            names.append(body.decode())
+            continue
+        offset = 0
+        for column in columns:
+            part = array(column.typecode)
+            size = count * part.itemsize
+            part.frombytes(body[offset:offset + size])
+            column.extend(to_le(part))
+            offset += size
+    return Timeline(names, *columns)
+
+
+"""
+parse_time(text)
+
+Parses an ISO 8601 time given on the command line into seconds since the epoch.
+"""
+def parse_time(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+
+"""
+clock(when)
+
+Formats seconds since the epoch as a time of day for the command line output.
+"""
+def clock(when):
+    return datetime.fromtimestamp(when).strftime("%H:%M:%S.%f")[:-3]
+
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard history queries")
+    parser.add_argument("--file", default=os.path.join("state", HISTORY_FILE),
+                        help="history file written by the daemon")
+    parser.add_argument("--since", help="ignore updates before this ISO time")
+    parser.add_argument("--until", help="ignore updates after this ISO time")
+    parser.add_argument("--run", type=int, default=-1,
+                        help="which of a room's runs to time for splits and "
+                             "pins, counting from 0, or back from the newest "
+                             "at -1")
+    parser.add_argument("command", choices=["rooms", "events", "splits", "pins",
+                                            "state", "h2h"])
+    parser.add_argument("rooms", nargs="*",
+                        help="the room, both rooms for h2h, or an ISO time "
+                             "for state")
+    args = parser.parse_args()
+    if args.command in ("splits", "pins") and len(args.rooms) != 1:
+        parser.error(f"{args.command} needs a room")
+    if args.command == "h2h" and len(args.rooms) != 2:
+        parser.error("h2h needs two rooms")
+    since, until = parse_time(args.since), parse_time(args.until)
+    timeline = load(args.file)
+    if args.command != "state":
+        for room in args.rooms:
+            if room not in timeline.index:
+                parser.error(f"no history for room {room}")
+    if args.command in ("splits", "pins"):
+        runs = len(timeline.runs(args.rooms[0], since, until))
+        if runs and not -runs <= args.run < runs:
+            parser.error(f"room {args.rooms[0]} has {runs} runs")
+
+    if args.command == "rooms":
+        for name in timeline.names:
+            print(f"{name:<16}{len(timeline.events(name, since, until)):>8}"
+                  f"{len(timeline.runs(name, since, until)):>6} runs")
+    elif args.command == "events":
+        room = args.rooms[0] if args.rooms else None
+        for when, name, step in timeline.events(room, since, until):
+            print(f"{clock(when)}  {name:<16}{step:>6}")
+    elif args.command == "splits":
+        for step, seconds in timeline.splits(args.rooms[0], None, since, until,
+                                             args.run):
+            print(f"pin {step:<6}{seconds:>10.1f}s")
+    elif args.command == "pins":
+        for step, seconds in timeline.pin_times(args.rooms[0], None, since,
+                                                until, args.run):
+            print(f"pin {step:<6}{seconds:>10.1f}s")
+    elif args.command == "state":
+        when = parse_time(args.rooms[0]) if args.rooms else until
+        for name, step in timeline.state_at(when or float("inf")).items():
+            print(f"{name:<16}{step:>6}")
+    else:
+        first, second = args.rooms[:2]
+        for when, name, step, lead in timeline.head_to_head(first, second,
+                                                            since, until):
+            print(f"{clock(when)}  {name:<16}{step:>6}  lead {lead:+d}")
+
+
+if __name__ == "__main__":
+    main()
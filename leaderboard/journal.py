@@ -0,0 +1,161 @@
+################################################################################
+#                                                                              #
+#  journal.py                                                                  #
+#                                                                              #
+#  This file defines the Journal class, which makes the leaderboard daemon's   #
+#  room state survive a restart. Every change is appended to a write-ahead     #
+#  log, which is periodically compacted into a snapshot. All file I/O runs on  #
+#  a single background thread, so persistence never blocks the event loop.     #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   05/29/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Directory the daemon keeps its state in, relative to the working directory
+STATE_DIR = "state"
+
+# File names of the snapshot and the write-ahead log within the directory
+SNAPSHOT_FILE = "rooms.snap"
+LOG_FILE      = "rooms.wal"
+
+# Number of logged changes after which the log is compacted into a snapshot
+COMPACT_EVERY = 1000
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Journal class
+
+Persists a RoomRegistry. Each change is logged as one JSON line holding the
+registry's seq after the change and the full record of the changed room, so
+replaying a line simply restores that room and replaying it twice is harmless.
+
+append() only buffers the line. A flusher task hands everything buffered to the
+writer thread as one write followed by one fsync, so bursts of updates share a
+single disk commit. Once COMPACT_EVERY lines have been logged, the same thread
+writes a snapshot of the registry next to the log and then empties the log.
+Lines buffered while a batch is on disk go to the next batch, after the
+snapshot, so nothing is lost to the truncation. The snapshot is replaced
+atomically, and replay() skips logged lines older than it and cuts off a line
+torn by a crash, so a crash at any point recovers the last committed state by
+reading at most one snapshot and COMPACT_EVERY lines.
+"""
+class Journal:
+    def __init__(self, directory=STATE_DIR, compact_every=COMPACT_EVERY):
+        self.snap_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, LOG_FILE)
+        self.compact_every = compact_every
+        self.registry = None
+        self.buffer = []
+        self.logged = 0
+        os.makedirs(directory, exist_ok=True)
+        self._log = None
+        self._wake = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1,
+                                            thread_name_prefix="journal")
+
+    def replay(self, registry):
+        seq = 0
+        if os.path.exists(self.snap_path):
+            with open(self.snap_path, "r") as f:
+                snap = json.load(f)
+            seq = snap["seq"]
+            for room in snap["rooms"]:
+                registry.restore(*room)
+        replayed = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, "r+b") as f:
+                good = 0
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("torn line")
+                        line_seq, *room = json.loads(line)
+                    except ValueError:
+                        f.truncate(good)
+                        break
+                    good += len(line)
+                    if line_seq >= seq:
+                        registry.restore(*room)
+                        seq = line_seq
+                        replayed += 1
+        registry.seq = seq
+        self.logged = replayed
+        return replayed
+
+    def start(self, registry):
+        self.registry = registry
+        self._log = open(self.log_path, "ab")
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._flusher())
+
+    def append(self, seq, record):
+        _, name, step, pins, rev, updated = record
+        line = json.dumps([seq, name, step, pins, rev, updated],
+                          separators=(",", ":"))
+        self.buffer.append(line.encode() + b"\n")
+        self._wake.set()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            await self._flush()
+        self._executor.shutdown(wait=True)
+        if self._log is not None:
+            self._log.close()
+
+    async def _flusher(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            await self._flush()
+
+    async def _flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = b"".join(self.buffer), []
+        self.logged += batch.count(b"\n")
+        snap = None
+        if self.logged >= self.compact_every:
+            self.logged = 0
+            snap = {"seq": self.registry.seq,
+                    "rooms": [record[1:] for record in self.registry.records()]}
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._commit, batch, snap)
+
+    def _commit(self, batch, snap):
+        self._log.write(batch)
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        if snap is None:
+            return
+        tmp_path = self.snap_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snap, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snap_path)
+        self._log.truncate(0)
+        self._log.flush()
+        os.fsync(self._log.fileno())
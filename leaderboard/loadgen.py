@@ -0,0 +1,322 @@
+################################################################################
+#                                                                              #
+#  loadgen.py                                                                  #
+#                                                                              #
+#  This file is a load generator and benchmark harness for the leaderboard     #
+#  daemon. It starts a daemon on the loopback interface and connects many      #
+#  simulated clients to it: writers which send progress updates at a fixed     #
+#  rate, readers which follow every room, and slow or stalled readers which    #
+#  fall behind. It reports end-to-end update latency, throughput, and the      #
+#  daemon's memory growth so that changes to the broadcast path can be         #
+#  compared between versions.                                                  #
+#                                                                              #
+#  Usage: python3 loadgen.py [--writers N] [--readers N] [--slow N] ...        #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/05/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import protocol
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+LO = '127.0.0.1'            # Address for local loopback interface
+PORT = 5600                 # Port the benchmark daemon listens on
+
+# Path to the daemon started by the benchmark
+DAEMON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "daemon.py")
+
+################################################################################
+#  GLOBALS                                                                     #
+################################################################################
+
+# Send time of each (room, step) progress update, from time.perf_counter()
+SENT = {}
+
+# End-to-end latencies in seconds of every update seen by a reader
+LATENCIES = []
+
+# Running totals reported at the end of the run
+TOTALS = {"updates_sent": 0, "messages_received": 0, "resyncs": 0,
+          "disconnects": 0}
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+percentile(values, pct)
+
+Returns the pct percentile of an already sorted list of values.
+"""
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+"""
+rss_kib(pid)
+
+Returns the resident set size of a process in KiB, read from /proc. Returns 0
+where /proc is not available.
+"""
+def rss_kib(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+"""
+connect(port)
+
+Opens a connection to the daemon, retrying while it starts up.
+"""
+async def connect(port):
+    for _ in range(100):
+        try:
+            return await asyncio.open_connection(LO, port)
+        except OSError:
+            await asyncio.sleep(0.05)
+    raise ConnectionError(f"daemon did not start on port {port}")
+
+
+"""
+writer_client(port, room, pins, rate, codec, stop)
+
+Registers a room and sends progress updates for it rate times per second until
+stop is set or the room reaches pins, recording the send time of each step.
+Messages sent back to the writer are read and discarded.
+"""
+async def writer_client(port, room, pins, rate, codec, stop):
+    reader, writer = await connect(port)
+    writer.write(protocol.encode_hello(room, pins, [room], codec.name))
+    drain = asyncio.create_task(discard(reader))
+    step = 0
+    interval = 1 / rate
+    next_send = time.perf_counter()
+    try:
+        while not stop.is_set() and step < pins:
+            step += 1
+            SENT[(room, step)] = time.perf_counter()
+            writer.write(codec.progress(room, step))
+            await writer.drain()
+            TOTALS["updates_sent"] += 1
+            next_send += interval
+            await asyncio.sleep(max(0, next_send - time.perf_counter()))
+    finally:
+        drain.cancel()
+        writer.close()
+
+
+"""
+discard(reader)
+
+Reads and throws away everything sent on a connection.
+"""
+async def discard(reader):
+    while await reader.read(65536):
+        pass
+
+
+"""
+reader_client(port, codec, delay, stop)
+
+Follows every room, answering the daemon's pings, and records the latency of
+each step change it sees. A positive delay makes the reader sleep that many
+seconds after every message, simulating a slow room terminal.
+"""
+async def reader_client(port, codec, delay, stop):
+    reader, writer = await connect(port)
+    writer.write(protocol.encode_hello(codec=codec.name))
+    mirror = protocol.StateMirror()
+    seen = {}
+    try:
+        while not stop.is_set():
+            msg = await protocol.read_message(reader, mirror.names)
+            if msg is None:
+                TOTALS["disconnects"] += 1
+                return
+            now = time.perf_counter()
+            TOTALS["messages_received"] += 1
+            if msg["type"] == "ping":
+                writer.write(codec.pong())
+                continue
+            if not mirror.apply(msg):
+                TOTALS["resyncs"] += 1
+                writer.write(codec.resync())
+                continue
+            rooms = msg.get("rooms") or msg.get("data") or {}
+            for room, entry in rooms.items():
+                step = entry["step"]
+                if seen.get(room) != step:
+                    seen[room] = step
+                    sent = SENT.get((room, step))
+                    if sent is not None:
+                        LATENCIES.append(now - sent)
+            if delay:
+                await asyncio.sleep(delay)
+    finally:
+        writer.close()
+
+
+"""
+stalled_client(port)
+
+Opens a connection with a tiny receive buffer, says hello, and never reads,
+like a room terminal whose network has silently gone away.
+"""
+async def stalled_client(port):
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, (LO, port))
+    await asyncio.get_running_loop().sock_sendall(
+        sock, protocol.encode_hello())
+    return sock
+
+
+"""
+run(args)
+
+Runs one benchmark and returns its results as a dict.
+"""
+async def run(args):
+    daemon = None
+    if not args.no_spawn:
+        daemon = subprocess.Popen(
+            [sys.executable, DAEMON, "--port", str(args.port), "--no-persist",
+             "--metrics-port", "0", "--metrics-interval", "0",
+             "--spectator-port", "0"] +
+            args.daemon_arg, stdout=subprocess.DEVNULL,
+            cwd=os.path.dirname(DAEMON))
+    codec = protocol.CODECS[args.codec]
+    stop = asyncio.Event()
+    try:
+        await connect(args.port)
+        rss_start = rss_kib(daemon.pid) if daemon else 0
+        stalled = [await stalled_client(args.port)
+                   for _ in range(args.stalled)]
+        tasks = [asyncio.create_task(reader_client(args.port, codec, 0, stop))
+                 for _ in range(args.readers)]
+        tasks += [asyncio.create_task(
+                      reader_client(args.port, codec, args.slow_delay, stop))
+                  for _ in range(args.slow)]
+        await asyncio.sleep(0.5)
+        tasks += [asyncio.create_task(
+                      writer_client(args.port, f"LOAD{i}", args.pins,
+                                    args.rate, codec, stop))
+                  for i in range(args.writers)]
+        rss_peak = rss_start
+        start = time.perf_counter()
+        while time.perf_counter() - start < args.duration:
+            await asyncio.sleep(0.5)
+            if daemon:
+                rss_peak = max(rss_peak, rss_kib(daemon.pid))
+        stop.set()
+        elapsed = time.perf_counter() - start
+        rss_end = rss_kib(daemon.pid) if daemon else 0
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for sock in stalled:
+            sock.close()
+    finally:
+        if daemon:
+            daemon.terminate()
+            daemon.wait()
+
+    latencies = sorted(LATENCIES)
+    return {
+        "duration_s": round(elapsed, 3),
+        "updates_sent": TOTALS["updates_sent"],
+        "updates_per_s": round(TOTALS["updates_sent"] / elapsed, 1),
+        "deliveries": len(latencies),
+        "deliveries_per_s": round(len(latencies) / elapsed, 1),
+        "messages_received": TOTALS["messages_received"],
+        "resyncs": TOTALS["resyncs"],
+        "disconnects": TOTALS["disconnects"],
+        "latency_ms": {
+            f"p{pct}": round(percentile(latencies, pct) * 1e3, 3)
+            for pct in (50, 90, 99, 99.9)
+        } | {"max": round(latencies[-1] * 1e3, 3) if latencies else 0.0},
+        "daemon_rss_kib": {"start": rss_start, "peak": rss_peak,
+                           "end": rss_end, "growth": rss_end - rss_start},
+    }
+
+
+"""
+parse_args()
+
+Parses the benchmark's command line options.
+"""
+def parse_args():
+    parser = argparse.ArgumentParser(description="Leaderboard load generator")
+    parser.add_argument("--port", type=int, default=PORT,
+                        help="port for the benchmark daemon")
+    parser.add_argument("--no-spawn", action="store_true",
+                        help="benchmark a daemon already running on --port")
+    parser.add_argument("--daemon-arg", action="append", default=[],
+                        help="extra argument passed to the daemon")
+    parser.add_argument("--writers", type=int, default=10,
+                        help="clients sending progress updates")
+    parser.add_argument("--rate", type=float, default=20,
+                        help="updates per second sent by each writer")
+    parser.add_argument("--pins", type=int, default=65535,
+                        help="pin count of each writer's room")
+    parser.add_argument("--readers", type=int, default=200,
+                        help="clients following every room")
+    parser.add_argument("--slow", type=int, default=20,
+                        help="readers which sleep after every message")
+    parser.add_argument("--slow-delay", type=float, default=0.05,
+                        help="seconds a slow reader sleeps per message")
+    parser.add_argument("--stalled", type=int, default=20,
+                        help="clients which never read")
+    parser.add_argument("--codec", choices=sorted(protocol.CODECS),
+                        default="binary", help="encoding used by every client")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="seconds to send updates for")
+    parser.add_argument("--json", action="store_true",
+                        help="print the results as JSON")
+    return parser.parse_args()
+
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results))
+        return
+    for key, value in results.items():
+        if isinstance(value, dict):
+            value = "  ".join(f"{k}={v}" for k, v in value.items())
+        print(f"{key:<20}{value}")
+
+
+if __name__ == "__main__":
+    main()
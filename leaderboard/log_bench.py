@@ -0,0 +1,106 @@
+################################################################################
+#                                                                              #
+#  log_bench.py                                                                #
+#                                                                              #
+#  This file is a micro-benchmark comparing the daemon's AsyncLog with the     #
+#  thread-based PrintQ it replaced. It times the cost of logging one client    #
+#  connection message on the caller's side, which is what handle_client pays,  #
+#  the cost on the event loop including the handoff of the batch, and the      #
+#  total cost per message once the batch has been written out.                 #
+#                                                                              #
+#  Usage: python3 log_bench.py [--iterations N]                                #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/10/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import asyncio
+import os
+import time
+
+from alog import AsyncLog
+from print_util import PrintQ
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# The client address logged by every message
+ADDR = ("127.0.0.1", 53124)
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+bench_printq(stream, iterations)
+
+Times iterations PrintQ.put() calls, then the wait for the print thread to
+write them all. The caller's thread pays only for the calls. Returns
+microseconds per message on the caller's side, on the caller's thread, and in
+total.
+"""
+def bench_printq(stream, iterations):
+    printq = PrintQ(maxsize=iterations + 1, stream=stream)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        printq.put(f"Client connected from {ADDR}")
+    put = time.perf_counter() - start
+    printq.shutdown(timeout=None)
+    total = time.perf_counter() - start
+    return put / iterations * 1e6, put / iterations * 1e6, \
+        total / iterations * 1e6
+
+
+"""
+bench_alog(stream, iterations)
+
+Times iterations AsyncLog.info() calls on a running event loop, then the flush
+which hands them to the writer thread, then the wait for the thread to write
+them all. Returns microseconds per message on the caller's side, on the event
+loop, and in total.
+"""
+async def bench_alog(stream, iterations):
+    log = AsyncLog(stream=stream, maxsize=iterations + 1)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        log.info("Client connected", addr=ADDR)
+    put = time.perf_counter() - start
+    future = log.flush()
+    loop = time.perf_counter() - start
+    future.result()
+    total = time.perf_counter() - start
+    return put / iterations * 1e6, loop / iterations * 1e6, \
+        total / iterations * 1e6
+
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard log benchmark")
+    parser.add_argument("--iterations", type=int, default=100000,
+                        help="messages logged per measurement")
+    args = parser.parse_args()
+
+    print(f"{args.iterations} messages per measurement, written to "
+          f"{os.devnull}")
+    print(f"{'sink':<10}{'call us':>10}{'loop us':>10}{'total us':>10}")
+    with open(os.devnull, "w") as stream:
+        for label, run in (
+                ("PrintQ", lambda: bench_printq(stream, args.iterations)),
+                ("AsyncLog", lambda: asyncio.run(
+                    bench_alog(stream, args.iterations)))):
+            put, loop, total = min(run() for _ in range(3))
+            print(f"{label:<10}{put:>10.3f}{loop:>10.3f}{total:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
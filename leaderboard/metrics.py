@@ -0,0 +1,157 @@
+################################################################################
+#                                                                              #
+#  metrics.py                                                                  #
+#                                                                              #
+#  This file defines lightweight counters, gauges, and latency histograms for  #
+#  the leaderboard daemon, along with a loopback endpoint and a periodic dump  #
+#  to report them. Recording a sample is a few attribute updates, so the       #
+#  instrumentation is cheap enough to leave on during an event.                #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/02/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+from bisect import bisect_left
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Upper bounds of the histogram buckets in seconds, doubling from 10us to ~42s
+BUCKETS = [1e-5 * 2 ** i for i in range(23)]
+
+# Percentiles reported for each histogram
+PERCENTILES = (50, 90, 99)
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Counter class
+
+A count of events which only ever goes up.
+"""
+class Counter:
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def lines(self, name):
+        return [f"{name} {self.value}"]
+
+
+"""
+Gauge class
+
+A value sampled only when the metrics are reported, by calling fn.
+"""
+class Gauge:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def lines(self, name):
+        return [f"{name} {self.fn()}"]
+
+
+"""
+Histogram class
+
+Counts samples into fixed buckets whose bounds double from one to the next, so
+recording is a binary search over BUCKETS and an increment. Percentiles are
+reported as the upper bound of the bucket they fall in, which is accurate to
+within a factor of two.
+"""
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct):
+        if not self.count:
+            return 0.0
+        rank = self.count * pct / 100
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def lines(self, name):
+        lines = [f"{name}_count {self.count}",
+                 f"{name}_sum {self.total:.6f}",
+                 f"{name}_max {self.max:.6f}"]
+        for pct in PERCENTILES:
+            lines.append(f"{name}_p{pct} {self.percentile(pct):.6f}")
+        return lines
+
+
+"""
+Metrics class
+
+A named collection of counters, gauges, and histograms. render() reports all of
+them as "name value" lines, which dump() hands to a print function every
+interval seconds and serve() returns over plain HTTP on a loopback port.
+"""
+class Metrics:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name):
+        return self.metrics.setdefault(name, Counter())
+
+    def gauge(self, name, fn):
+        self.metrics[name] = Gauge(fn)
+        return self.metrics[name]
+
+    def histogram(self, name):
+        return self.metrics.setdefault(name, Histogram())
+
+    def render(self):
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].lines(name))
+        return "\n".join(lines) + "\n"
+
+    async def dump(self, interval, print_fn):
+        while True:
+            await asyncio.sleep(interval)
+            print_fn(self.render().rstrip("\n"))
+
+    async def serve(self, host, port):
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader, writer):
+        try:
+            await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5)
+            body = self.render().encode()
+            writer.write(b"HTTP/1.0 200 OK\r\n"
+                         b"Content-Type: text/plain; charset=utf-8\r\n" +
+                         f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        except Exception:
+            pass
+        finally:
+            writer.close()
+
+
+# The metrics of this process, shared by every module which records them
+METRICS = Metrics()
@@ -0,0 +1,146 @@
+################################################################################
+#                                                                              #
+#  peer.py                                                                     #
+#                                                                              #
+#  This file defines the Peer class used by the leaderboard daemon to send     #
+#  state to each connected client. Every peer owns a single outbound slot and  #
+#  a dedicated sender task, so that a slow client only ever holds the newest   #
+#  state instead of a backlog of every intermediate update.                    #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   05/20/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+import time
+
+from metrics import METRICS
+from protocol import CODECS, LEGACY_VERSION
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Seconds a client is given to accept a message before it is dropped
+SEND_TIMEOUT = 2.0
+
+################################################################################
+#  METRICS                                                                     #
+################################################################################
+
+DRAIN_TIME     = METRICS.histogram("peer_drain_seconds")
+UPDATE_LATENCY = METRICS.histogram("update_latency_seconds")
+DELTAS_SENT    = METRICS.counter("deltas_sent")
+SNAPSHOTS_SENT = METRICS.counter("snapshots_sent")
+COALESCED      = METRICS.counter("updates_coalesced")
+PINGS_SENT     = METRICS.counter("pings_sent")
+DROPPED        = METRICS.counter("peers_dropped")
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Peer class
+
+Wraps the StreamWriter of a connected client with a one-message outbound slot.
+offer() places a protocol.Update in the slot. If the slot was still full, the
+updates can no longer be sent one by one, so the peer instead falls back to a
+full snapshot from the snapshot(version, codec) callable once it is ready to
+send. Messages are encoded with the peer's codec, chosen by its hello.
+Bursts of updates therefore coalesce into the most recent state and memory per
+client stays constant. Version 1 peers always receive the full state. rooms
+holds the registry indices the peer is subscribed to, or None for all. A sender
+task drains the slot, giving each write SEND_TIMEOUT seconds to flush; a client
+that misses its deadline is disconnected and its error recorded for the daemon.
+Each send records how long the drain took and, for updates, how long it has
+been since the change was made. ping() has the sender write a heartbeat ahead
+of whatever else it sends next, and last_seen is the monotonic time the daemon
+last heard from the client.
+"""
+class Peer:
+    def __init__(self, writer, snapshot, send_timeout=SEND_TIMEOUT):
+        self.writer = writer
+        self.addr = writer.get_extra_info('peername')
+        self.snapshot = snapshot
+        self.send_timeout = send_timeout
+        self.version = LEGACY_VERSION
+        self.codec = CODECS["json"]
+        self.rooms = None
+        self.pending = None
+        self.resync = False
+        self.coalesced = 0
+        self.error = None
+        self.last_seen = time.monotonic()
+        self._ping = False
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._sender())
+
+    @property
+    def closed(self):
+        return self._task.done()
+
+    def offer(self, update):
+        if self.closed:
+            return
+        if self.pending is not None:
+            self.coalesced += 1
+            COALESCED.inc()
+            self.resync = True
+        self.pending = update
+        self._ready.set()
+
+    def ping(self):
+        self._ping = True
+        self._ready.set()
+
+    def request_snapshot(self):
+        self.resync = True
+        self._ready.set()
+
+    def close(self):
+        self._task.cancel()
+
+    async def _sender(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                ping, self._ping = self._ping, False
+                update, self.pending = self.pending, None
+                if self.resync or self.version == LEGACY_VERSION:
+                    self.resync = False
+                    payload = self.snapshot(self.version, self.codec)
+                    SNAPSHOTS_SENT.inc()
+                elif update is not None:
+                    payload = update.payload(self.codec)
+                    DELTAS_SENT.inc()
+                elif ping:
+                    payload = b""
+                else:
+                    continue
+                if ping:
+                    payload = self.codec.ping() + payload
+                    PINGS_SENT.inc()
+                start = time.perf_counter()
+                self.writer.write(payload)
+                await asyncio.wait_for(self.writer.drain(), self.send_timeout)
+                end = time.perf_counter()
+                DRAIN_TIME.record(end - start)
+                if update is not None:
+                    UPDATE_LATENCY.record(end - update.created)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self.error = f"send timed out after {self.send_timeout}s"
+            DROPPED.inc()
+            self.writer.transport.abort()
+        except Exception as e:
+            self.error = str(e)
+            DROPPED.inc()
+            self.writer.transport.abort()
@@ -15,28 +15,93 @@
 #  IMPORTS                                                                     #
 ################################################################################
 
-import asyncio
+import atexit
 import sys
 import threading
-import queue
+from collections import deque
 
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Most messages held before the overflow policy applies
+MAX_QUEUE = 10000
+
+# Overflow policies: discard the oldest queued message, or wait for space
+DROP_OLDEST = "drop-oldest"
+BLOCK       = "block"
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+PrintQ class
+
+Prints messages from a background thread so that callers never wait on the
+console. The thread takes every message queued since its last write, joins
+them, and writes and flushes them as one batch. At most maxsize messages are
+held; beyond that, the drop-oldest policy discards the oldest message, and a
+count of dropped messages is printed with the next batch, while the block
+policy makes put() wait for the thread to catch up. Putting None, calling
+shutdown(), or exiting the interpreter stops the thread once everything queued
+has been written.
+"""
 class PrintQ:
-    def __init__(self):
-        self.queue = queue.Queue()
-        self.QThread = threading.Thread(target=self._print_thread, daemon=True)
+    def __init__(self, maxsize=MAX_QUEUE, policy=DROP_OLDEST, stream=None):
+        self.maxsize = maxsize
+        self.policy = policy
+        self.stream = stream if stream is not None else sys.__stdout__
+        self.dropped = 0
         self.run = True
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self.QThread = threading.Thread(target=self._print_thread, daemon=True)
         self.QThread.start()
+        atexit.register(self.shutdown)
 
-    def put(self, msg):
-        self.queue.put(msg)
+    def __len__(self):
+        return len(self._queue)
 
-    def shutdown(self):
-        self.run = False
+    def put(self, msg, end="\n"):
+        with self._cond:
+            if msg is None:  # signal to exit
+                self.run = False
+            elif self.run:
+                while len(self._queue) >= self.maxsize:
+                    if self.policy == BLOCK and self.run:
+                        self._cond.wait()
+                        continue
+                    self._queue.popleft()
+                    self.dropped += 1
+                self._queue.append(msg + end)
+            self._cond.notify_all()
+
+    def shutdown(self, timeout=1.0):
+        with self._cond:
+            self.run = False
+            self._cond.notify_all()
+        if threading.current_thread() is not self.QThread:
+            self.QThread.join(timeout)
 
     def _print_thread(self):
-        while self.run:
-            msg = self.queue.get()
-            if msg is None:  # signal to exit
-                break
-            sys.__stdout__.write(msg + "\n")
-            sys.__stdout__.flush()
+        reported = 0
+        while True:
+            with self._cond:
+                while self.run and not self._queue:
+                    self._cond.wait()
+                if not self._queue:
+                    break
+                batch = list(self._queue)
+                self._queue.clear()
+                dropped = self.dropped
+                self._cond.notify_all()
+            if dropped != reported:
+                batch.insert(0, f"[PrintQ] dropped {dropped - reported} "
+                                "messages\n")
+                reported = dropped
+            try:
+                self.stream.write("".join(batch))
+                self.stream.flush()
+            except (OSError, ValueError):
+                pass
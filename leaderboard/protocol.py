@@ -0,0 +1,469 @@
+################################################################################
+#                                                                              #
+#  protocol.py                                                                 #
+#                                                                              #
+#  This file defines the messages exchanged between the leaderboard daemon     #
+#  and the room clients. Version 1 clients receive the whole state on every    #
+#  update. Version 2 clients announce themselves with a hello message and      #
+#  then receive a full snapshot followed by deltas carrying only the rooms     #
+#  that changed, each stamped with the room's revision number. Version 2       #
+#  messages may be sent either as newline delimited JSON or as compact         #
+#  length-prefixed binary frames, as negotiated in the hello.                  #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   05/22/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+import json
+import struct
+import time
+from datetime import datetime
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# The newest protocol version understood by this module
+PROTOCOL_VERSION = 2
+
+# The protocol version assumed for clients which never send a hello
+LEGACY_VERSION = 1
+
+# Largest binary frame body accepted from the network
+MAX_FRAME = 1 << 20
+
+# Longest room name, in UTF-8 bytes, since binary snapshots give it in one byte
+MAX_NAME = 255
+
+# Largest pin count or step, since binary records carry them as 16 bit values
+MAX_PINS = 0xFFFF
+
+# Most rooms a client may subscribe to in its hello
+MAX_SUBSCRIBE = 1024
+
+# Binary frame header: the length of the frame body that follows
+FRAME = struct.Struct("!I")
+
+# Binary message header: message type, sequence number, and room count
+HEADER = struct.Struct("!BQH")
+
+# Binary room record: index, step, pins, revision, and update time
+RECORD = struct.Struct("!HHHId")
+
+# Binary progress update header: message type and step, followed by the room
+PROGRESS = struct.Struct("!BH")
+
+# Binary message types
+T_SNAPSHOT = 1
+T_DELTA    = 2
+T_PROGRESS = 3
+T_RESYNC   = 4
+T_PING     = 5
+T_PONG     = 6
+
+################################################################################
+#  ENCODING FUNCTIONS                                                          #
+################################################################################
+
+"""
+encode(msg)
+
+Encodes a single message dict as a newline terminated JSON line.
+"""
+def encode(msg):
+    return (json.dumps(msg, separators=(",", ":")) + "\n").encode()
+
+
+"""
+json_entries(records)
+
+Converts registry records into the room entries used by JSON messages, keyed by
+room name, with update times given as ISO 8601 strings.
+"""
+def json_entries(records):
+    return {
+        name: {
+            "step": step,
+            "pins": pins,
+            "rev": rev,
+            "last_updated":
+                datetime.fromtimestamp(updated).isoformat() if updated else None,
+        }
+        for _, name, step, pins, rev, updated in records
+    }
+
+
+"""
+encode_hello(room, pins, subscribe, codec, reset)
+
+Encodes the hello message a client sends to request the newest protocol. room
+and pins register the client's own room with the daemon, subscribe lists the
+rooms to receive updates for, or is None to receive every room, and codec names
+the encoding the daemon should use for messages to the client. reset asks the
+daemon to move the client's room back to step 0 for a new team. The hello
+itself is always JSON.
+"""
+def encode_hello(room=None, pins=None, subscribe=None, codec="json",
+                 reset=False):
+    msg = {"type": "hello", "version": PROTOCOL_VERSION, "codec": codec}
+    if room is not None:
+        msg["room"] = room
+        msg["pins"] = pins
+        if reset:
+            msg["reset"] = True
+    if subscribe is not None:
+        msg["subscribe"] = list(subscribe)
+    return encode(msg)
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+JsonCodec class
+
+Encodes messages as newline delimited JSON. state() builds the full state
+message for version 1 clients; snapshot() and delta() build version 2 messages
+from registry records. ping() is sent by the daemon to idle version 2 clients,
+which answer with pong().
+"""
+class JsonCodec:
+    name = "json"
+
+    def state(self, records):
+        return encode({"type": "state", "data": json_entries(records)})
+
+    def snapshot(self, seq, records):
+        return encode({"type": "snapshot", "seq": seq,
+                       "data": json_entries(records)})
+
+    def delta(self, seq, records):
+        return encode({"type": "delta", "seq": seq,
+                       "rooms": json_entries(records)})
+
+    def progress(self, room, step):
+        return encode({"type": "progress_update", "room": room, "step": step})
+
+    def resync(self):
+        return encode({"type": "resync"})
+
+    def ping(self):
+        return encode({"type": "ping"})
+
+    def pong(self):
+        return encode({"type": "pong"})
+
+
+"""
+BinaryCodec class
+
+Encodes messages as length-prefixed binary frames. Snapshots and deltas are a
+HEADER followed by one fixed size RECORD per room; snapshots also follow each
+record with the room's name so that clients can map indices to names, while
+deltas carry only indices. Each message is packed into a buffer owned by the
+codec which is reused from one message to the next, so encoding allocates only
+the final bytes object shared by every peer.
+"""
+class BinaryCodec:
+    name = "binary"
+
+    def __init__(self):
+        self._buf = bytearray(4096)
+
+    def snapshot(self, seq, records):
+        names = [record[1].encode() for record in records]
+        size = (FRAME.size + HEADER.size + len(records) * (RECORD.size + 1) +
+                sum(len(name) for name in names))
+        buf = self._reserve(size)
+        offset = self._pack_header(buf, size, T_SNAPSHOT, seq, len(records))
+        for record, name in zip(records, names):
+            idx, _, step, pins, rev, updated = record
+            RECORD.pack_into(buf, offset, idx, step, pins, rev, updated)
+            offset += RECORD.size
+            buf[offset] = len(name)
+            buf[offset + 1:offset + 1 + len(name)] = name
+            offset += 1 + len(name)
+        return bytes(memoryview(buf)[:size])
+
+    def delta(self, seq, records):
+        size = FRAME.size + HEADER.size + len(records) * RECORD.size
+        buf = self._reserve(size)
+        offset = self._pack_header(buf, size, T_DELTA, seq, len(records))
+        for idx, _, step, pins, rev, updated in records:
+            RECORD.pack_into(buf, offset, idx, step, pins, rev, updated)
+            offset += RECORD.size
+        return bytes(memoryview(buf)[:size])
+
+    def progress(self, room, step):
+        body = PROGRESS.pack(T_PROGRESS, step) + room.encode()
+        return FRAME.pack(len(body)) + body
+
+    def resync(self):
+        return FRAME.pack(1) + bytes([T_RESYNC])
+
+    def ping(self):
+        return FRAME.pack(1) + bytes([T_PING])
+
+    def pong(self):
+        return FRAME.pack(1) + bytes([T_PONG])
+
+    def _reserve(self, size):
+        if len(self._buf) < size:
+            self._buf = bytearray(max(size, 2 * len(self._buf)))
+        return self._buf
+
+    def _pack_header(self, buf, size, kind, seq, count):
+        FRAME.pack_into(buf, 0, size - FRAME.size)
+        HEADER.pack_into(buf, FRAME.size, kind, seq, count)
+        return FRAME.size + HEADER.size
+
+
+# The codecs a client may ask for in its hello, by name
+CODECS = {codec.name: codec for codec in (JsonCodec(), BinaryCodec())}
+
+
+"""
+Update class
+
+A change to the registry waiting to be sent to peers. The records are copied
+when the change is made, and payload() encodes them the first time a peer using
+a given codec asks, after which every other peer with that codec shares the
+same bytes. created is the perf_counter() time the change was made.
+"""
+class Update:
+    def __init__(self, seq, records):
+        self.seq = seq
+        self.records = records
+        self.created = time.perf_counter()
+        self._payloads = {}
+
+    def payload(self, codec):
+        data = self._payloads.get(codec.name)
+        if data is None:
+            data = codec.delta(self.seq, self.records)
+            self._payloads[codec.name] = data
+        return data
+
+
+"""
+StateMirror class
+
+The client side copy of the daemon state. apply() takes any decoded state,
+snapshot, or delta message and patches the copy in place. A delta entry whose
+revision is not exactly one past the known revision of that room means an
+update was missed; apply() then ignores the message and returns False, and the
+client should ask for a resync. Entries at or below the known revision have
+already been applied and are skipped. names maps the room indices used by
+binary deltas back to room names, and is refreshed by every binary snapshot.
+"""
+class StateMirror:
+    def __init__(self):
+        self.seq = None
+        self.rooms = {}
+        self.names = {}
+
+    def apply(self, msg):
+        kind = msg["type"]
+        if kind == "state":
+            self.rooms = msg["data"]
+        elif kind == "snapshot":
+            self.seq = msg["seq"]
+            self.rooms = msg["data"]
+            self.names = msg.get("names", self.names)
+        elif kind == "delta":
+            if self.seq is None or msg.get("missing"):
+                return False
+            fresh = {}
+            for name, entry in msg["rooms"].items():
+                known = self.rooms.get(name)
+                rev = known["rev"] if known is not None else 0
+                if entry["rev"] > rev + 1:
+                    return False
+                if entry["rev"] == rev + 1:
+                    fresh[name] = entry
+            self.seq = max(self.seq, msg["seq"])
+            self.rooms.update(fresh)
+        else:
+            raise ValueError(f"Not a state message: {kind}")
+        return True
+
+    def step(self, room):
+        entry = self.rooms.get(room)
+        return entry["step"] if entry is not None else 0
+
+################################################################################
+#  DECODING FUNCTIONS                                                          #
+################################################################################
+
+"""
+decode_frame(body, names)
+
+Decodes the body of a binary frame into the same message dict a JSON message
+would produce. names maps room indices to names for deltas; a delta naming an
+unknown index is marked as missing so that the client asks for a resync.
+Binary update times are left as seconds since the epoch, or None. A body too
+short for what it claims to hold raises ValueError, like any other bad frame.
+"""
+def decode_frame(body, names=None):
+    check_length(body, 1)
+    kind = body[0]
+    if kind == T_PROGRESS:
+        check_length(body, PROGRESS.size)
+        _, step = PROGRESS.unpack_from(body)
+        return {"type": "progress_update",
+                "room": body[PROGRESS.size:].decode(), "step": step}
+    if kind == T_RESYNC:
+        return {"type": "resync"}
+    if kind == T_PING:
+        return {"type": "ping"}
+    if kind == T_PONG:
+        return {"type": "pong"}
+    if kind not in (T_SNAPSHOT, T_DELTA):
+        raise ValueError(f"Unknown binary message type {kind}")
+    check_length(body, HEADER.size)
+    _, seq, count = HEADER.unpack_from(body)
+    offset = HEADER.size
+    rooms = {}
+    if kind == T_SNAPSHOT:
+        index = {}
+        for _ in range(count):
+            check_length(body, offset + RECORD.size + 1)
+            idx, step, pins, rev, updated = RECORD.unpack_from(body, offset)
+            length = body[offset + RECORD.size]
+            offset += RECORD.size + 1
+            check_length(body, offset + length)
+            name = body[offset:offset + length].decode()
+            offset += length
+            index[idx] = name
+            rooms[name] = {"step": step, "pins": pins, "rev": rev,
+                           "last_updated": updated or None}
+        return {"type": "snapshot", "seq": seq, "data": rooms, "names": index}
+    check_length(body, offset + count * RECORD.size)
+    names = names or {}
+    missing = False
+    for idx, step, pins, rev, updated in RECORD.iter_unpack(
+            body[offset:offset + count * RECORD.size]):
+        name = names.get(idx)
+        if name is None:
+            missing = True
+            continue
+        rooms[name] = {"step": step, "pins": pins, "rev": rev,
+                       "last_updated": updated or None}
+    return {"type": "delta", "seq": seq, "rooms": rooms, "missing": missing}
+
+
+"""
+check_length(body, size)
+
+Raises ValueError if a binary frame body is shorter than size bytes.
+"""
+def check_length(body, size):
+    if len(body) < size:
+        raise ValueError(f"Binary frame of {len(body)} bytes is truncated, "
+                         f"expected at least {size}")
+
+
+"""
+read_message(reader, names, max_frame)
+
+Reads the next message from a StreamReader, whichever encoding it uses. JSON
+messages always begin with an opening brace, which no binary frame header can,
+so a single byte is enough to tell them apart. JSON lines are bounded by the
+reader's own limit and binary frames by max_frame; either raises ValueError
+when exceeded. Returns None at end of stream.
+"""
+async def read_message(reader, names=None, max_frame=MAX_FRAME):
+    try:
+        first = await reader.readexactly(1)
+    except asyncio.IncompleteReadError:
+        return None
+    if first == b"{":
+        line = await reader.readline()
+        if not line.endswith(b"\n"):
+            return None
+        return json.loads(first + line)
+    try:
+        header = first + await reader.readexactly(FRAME.size - 1)
+        (length,) = FRAME.unpack(header)
+        if not 0 < length <= max_frame:
+            raise ValueError(f"Bad frame length {length}")
+        body = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+    return decode_frame(body, names)
+
+
+"""
+validate(msg)
+
+Checks that a message received by the daemon from a client is one it accepts
+and that every field it uses has the right type and range, raising ValueError
+naming the first problem found. Room names must be non-empty strings of at most
+MAX_NAME bytes, and steps and pin counts must lie between 1 and MAX_PINS.
+"""
+def validate(msg):
+    if not isinstance(msg, dict):
+        raise ValueError("message is not an object")
+    kind = msg.get("type")
+    if kind == "progress_update":
+        check_name(msg.get("room"))
+        check_count(msg.get("step"), "step")
+    elif kind == "hello":
+        version = msg.get("version")
+        if not is_int(version) or version < LEGACY_VERSION:
+            raise ValueError(f"bad protocol version {version!r}")
+        if msg.get("codec") is not None and not isinstance(msg["codec"], str):
+            raise ValueError("codec is not a string")
+        if msg.get("room") is not None:
+            check_name(msg["room"])
+            if msg.get("pins") is not None:
+                check_count(msg["pins"], "pins")
+        if msg.get("reset") is not None and not isinstance(msg["reset"], bool):
+            raise ValueError("reset is not a boolean")
+        subscribe = msg.get("subscribe")
+        if subscribe is not None:
+            if not isinstance(subscribe, list):
+                raise ValueError("subscribe is not a list")
+            if len(subscribe) > MAX_SUBSCRIBE:
+                raise ValueError(f"more than {MAX_SUBSCRIBE} subscriptions")
+            for name in subscribe:
+                check_name(name)
+    elif kind not in ("resync", "pong"):
+        raise ValueError(f"unknown message type {kind!r}")
+
+
+"""
+is_int(value)
+
+Returns whether a decoded JSON value is an integer, which excludes booleans.
+"""
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+"""
+check_name(name)
+
+Raises ValueError unless name is a usable room name.
+"""
+def check_name(name):
+    if not isinstance(name, str) or not name:
+        raise ValueError(f"bad room name {name!r}")
+    if len(name.encode()) > MAX_NAME:
+        raise ValueError(f"room name longer than {MAX_NAME} bytes")
+
+
+"""
+check_count(value, field)
+
+Raises ValueError unless value is a usable step or pin count for the field.
+"""
+def check_count(value, field):
+    if not is_int(value) or not 1 <= value <= MAX_PINS:
+        raise ValueError(f"{field} {value!r} is not between 1 and {MAX_PINS}")
@@ -0,0 +1,47 @@
+################################################################################
+#                                                                              #
+#  ratelimit.py                                                                #
+#                                                                              #
+#  This file defines the TokenBucket class, which the leaderboard daemon uses  #
+#  to limit how fast each client may send messages, so that one misbehaving    #
+#  client cannot flood every other client with broadcasts.                     #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/16/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import time
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+TokenBucket class
+
+Allows rate events per second on average, with bursts of up to burst events.
+The bucket starts full and refills continuously; take() removes a token and
+returns True, or returns False without waiting if the bucket is empty. Tokens
+are topped up lazily on each call, so an idle bucket costs nothing.
+"""
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def take(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
@@ -18,12 +18,19 @@
 ################################################################################
 
 import asyncio
-import json
 import os
+import random
+import shutil
 import sys
 # import threading
 # import queue
 
+try:
+    import aioconsole
+except ImportError:
+    aioconsole = None
+
+import protocol
 from print_util import PrintQ
 
 ################################################################################
@@ -33,7 +40,13 @@ from print_util import PrintQ
 LO = '127.0.0.1'            # Address for local loopback interface
 PORT = 5000                 # Port for the server to listen on
 NUM_PINS = 4                # Number of pins in the lock
-ROOM = None                 # Will be set to 'A' or 'B' via CLI args
+ROOM = None                 # Will be set to the room name via CLI args
+OPPONENTS = None            # Rooms to show, or None for every other room
+CODEC = protocol.CODECS["binary"]  # Encoding requested from the daemon
+
+BACKOFF_MIN = 0.05          # Seconds before the first reconnect attempt
+BACKOFF_MAX = 5.0           # Longest wait between reconnect attempts
+SILENCE_MAX = 60.0          # Seconds without a message before reconnecting
 
 CODES = ["WEIRDDONKEY", "SWISS", "SHRONKYOU", "TRINITY"]
 
@@ -47,134 +60,346 @@ step = 0 # Current step in the lock override process
 
 used_codes = [] # List of codes already used by player
 
-def safe_print(msg=""):
-    print_queue.put(msg)
+mirror = protocol.StateMirror() # Local copy of the daemon's room state
+
+connection = None # Writer to the daemon while connected, otherwise None
+
+pending = {} # Unacknowledged progress updates, keyed by (room, step)
+
+fresh = True # Whether the room is still to be reset for this client's team
+
+stdin = None # StreamReader fed from standard input by the event loop, if any
+
+def safe_print(msg="", end="\n"):
+    print_queue.put(msg, end)
 
 ################################################################################
-#  INPUT FUNCTION                                                              #
+#  INPUT FUNCTIONS                                                             #
 ################################################################################
 
+"""
+open_stdin()
+
+Registers standard input with the running event loop and returns a StreamReader
+which is fed whatever the player types. The loop only reads the descriptor once
+it is readable, so no thread is tied up waiting for a line and a pending read
+is cancelled like any other coroutine. Returns None where the loop cannot watch
+standard input, such as when it is redirected from a regular file.
+"""
+def open_stdin():
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    fd = sys.stdin.fileno()
+
+    def on_readable():
+        data = os.read(fd, 4096)
+        if data:
+            reader.feed_data(data)
+        else:
+            loop.remove_reader(fd)
+            reader.feed_eof()
+
+    try:
+        loop.add_reader(fd, on_readable)
+    except (OSError, ValueError, NotImplementedError):
+        return None
+    return reader
+
+def close_stdin():
+    if stdin is not None:
+        asyncio.get_running_loop().remove_reader(sys.stdin.fileno())
+
+"""
+ainput(prompt)
+
+Prints the prompt and waits for the next line of input, without the newline.
+Lines come from the stdin reader when the loop can watch standard input, and
+otherwise from aioconsole, falling back to a thread running input() only when
+aioconsole is not installed. Raises EOFError once input is exhausted.
+"""
 async def ainput(prompt=''):
     safe_print(prompt)
-    return await asyncio.get_event_loop().run_in_executor(None, input)
+    if stdin is not None:
+        line = await stdin.readline()
+        if not line:
+            raise EOFError("end of input")
+        return line.decode().rstrip("\r\n")
+    if aioconsole is not None:
+        return await aioconsole.ainput()
+    return await asyncio.get_running_loop().run_in_executor(None, input)
 
 ################################################################################
 #  DISPLAY FUNCTION                                                            #
 ################################################################################
 
-def show_display(step_a, step_b):
-    os.system('cls' if os.name == 'nt' else 'clear')
-    lines = []
-    lines.append("╔════════════════════════════════════════════════╗")
-    lines.append("║                                                ║")
-    lines.append("║              DOOR OVERRIDE STATUS              ║")
-    lines.append("╠════════════════════════════════════════════════╣")
-    lines.append("║                                                ║")
-    own_step = step_a if ROOM == "A" else step_b
-    other_step = step_b if ROOM == "A" else step_a
-    for i in range(NUM_PINS):
-        if i < own_step:
-            lines.append("║ ⚙━━                               ━━⚙ [CLEAR]  ║")
-        else:
-            lines.append("║ ⚙━━┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄━━⚙ [LOCKED] ║")
-        lines.append("║                                                ║")
-    lines.append("╠════════════════════════════════════════════════╣")
-    lines.append("║                                                ║")
-    lines.append("║         OPPONENT DOOR OVERRIDE STATUS          ║")
-    lines.append("╠════════════════════════════════════════════════╣")
-    lines.append("║                                                ║")
-    for i in range(NUM_PINS):
-        if i < other_step:
-            lines.append("║ ⚙━━                               ━━⚙ [CLEAR]  ║")
+CLEAR_LINE  = "║ ⚙━━                               ━━⚙ [CLEAR]  ║"
+LOCKED_LINE = "║ ⚙━━┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄━━⚙ [LOCKED] ║"
+BLANK_LINE  = "║                                                ║"
+RULE_LINE   = "╠════════════════════════════════════════════════╣"
+
+CLEAR_SCREEN = "\x1b[H\x1b[2J"  # Move the cursor home and clear the screen
+SAVE_CURSOR  = "\x1b7"           # Remember the cursor position
+LOAD_CURSOR  = "\x1b8"           # Return to the remembered cursor position
+CLEAR_BELOW  = "\x1b[J"          # Clear from the cursor to the end of the screen
+
+# Rows below the frame used by the typed code and any message about it
+INPUT_ROWS = 4
+
+def opponent_rooms(rooms):
+    if OPPONENTS is not None:
+        return [name for name in OPPONENTS if name in rooms]
+    return [name for name in rooms if name != ROOM]
+
+"""
+Display class
+
+Draws the door override status screen. The frame around the pins depends only
+on which rooms are shown, their pin counts, and whether this room's door is
+open, so it is built once per such layout. While the layout stays the same,
+render() redraws only the pin rows whose state changed, moving the cursor to
+each row in place and then back to the input prompt, and sends the whole update
+to the terminal as a single write. invalidate() forces the next render to
+clear and redraw the screen, for when other output may have scrolled it.
+clear_input() wipes what was typed and printed below the frame and returns the
+cursor to the input row, so entering a code leaves the pin rows where they are;
+only a terminal too short to hold the frame and INPUT_ROWS below it, where the
+typing may have scrolled the frame, needs the full redraw.
+"""
+class Display:
+    def __init__(self):
+        self.layout = None
+        self.frame = []
+        self.pin_rows = []
+        self.shown = {}
+        if os.name == 'nt':
+            os.system('')  # Turns on ANSI escape handling in the console
+
+    def invalidate(self):
+        self.layout = None
+
+    def clear_input(self):
+        if self.layout is None:
+            return
+        if len(self.frame) + INPUT_ROWS > shutil.get_terminal_size().lines:
+            self.invalidate()
+            return
+        safe_print(f"\x1b[{len(self.frame) + 1};1H" + CLEAR_BELOW, end="")
+
+    def render(self, rooms):
+        own = rooms.get(ROOM, {"step": 0, "pins": NUM_PINS})
+        sections = [(ROOM, own)] + [(name, rooms[name])
+                                    for name in opponent_rooms(rooms)]
+        layout = (tuple((name, entry.get("pins", NUM_PINS))
+                        for name, entry in sections),
+                  own["step"] >= NUM_PINS)
+        full = layout != self.layout
+        if full:
+            self._build(layout)
+            self.shown = {}
+        changed = []
+        for row, section, pin in self.pin_rows:
+            step = sections[section][1]["step"]
+            line = CLEAR_LINE if pin < step else LOCKED_LINE
+            if self.shown.get(row) != line:
+                self.shown[row] = line
+                changed.append((row, line))
+        if full:
+            lines = list(self.frame)
+            for row, line in changed:
+                lines[row] = line
+            safe_print(CLEAR_SCREEN + "\n".join(lines))
+        elif changed:
+            safe_print(SAVE_CURSOR +
+                       "".join(f"\x1b[{row + 1};1H{line}"
+                               for row, line in changed) +
+                       LOAD_CURSOR, end="")
+
+    def _build(self, layout):
+        sections, done = layout
+        self.layout = layout
+        self.frame = ["╔════════════════════════════════════════════════╗",
+                      BLANK_LINE,
+                      "║              DOOR OVERRIDE STATUS              ║"]
+        self.pin_rows = []
+        for section, (name, pins) in enumerate(sections):
+            if section:
+                self.frame.append(RULE_LINE)
+                self.frame.append(BLANK_LINE)
+                title = f"OPPONENT {name} DOOR OVERRIDE STATUS"
+                self.frame.append("║" + title.center(48) + "║")
+            self.frame.append(RULE_LINE)
+            self.frame.append(BLANK_LINE)
+            for pin in range(pins):
+                self.pin_rows.append((len(self.frame), section, pin))
+                self.frame.append(LOCKED_LINE)
+                self.frame.append(BLANK_LINE)
+        if done:
+            self.frame.append(RULE_LINE)
+            self.frame.append(BLANK_LINE)
+            self.frame.append("║   CONGRATULATIONS! YOU HAVE UNLOCKED THE DOOR! ║")
+            self.frame.append(BLANK_LINE)
+            self.frame.append("╚════════════════════════════════════════════════╝")
         else:
-            lines.append("║ ⚙━━┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄◉┄┄┄━━⚙ [LOCKED] ║")
-        lines.append("║                                                ║")
-    if own_step == NUM_PINS:
-        lines.append("╠════════════════════════════════════════════════╣")
-        lines.append("║                                                ║")
-        lines.append("║   CONGRATULATIONS! YOU HAVE UNLOCKED THE DOOR! ║")
-        lines.append("║                                                ║")
-        lines.append("╚════════════════════════════════════════════════╝")
-    else:
-        lines.append("╚════════════════════════════════════════════════╝")
-        lines.append("ENTER DUNGEON OVERRIDE CODE: ")
-    for line in lines:
-        safe_print(line)
+            self.frame.append("╚════════════════════════════════════════════════╝")
+            self.frame.append("ENTER DUNGEON OVERRIDE CODE: ")
+
+display = Display() # The status screen, redrawn as the state changes
+
+def show_display(rooms):
+    display.render(rooms)
 
 ################################################################################
 #  NETWORK COROUTINES                                                          #
 ################################################################################
 
-async def send_progress(writer):
+"""
+send_progress()
+
+Reads override codes from the player. Each new valid code advances the room's
+step, and the update is kept in pending until the daemon's state shows it, so
+codes entered while the daemon is unreachable are sent once it is back.
+"""
+async def send_progress():
     global step
-    show_display(0, 0)
+    show_display({})
     while True:
         try:
             pass_str = await ainput(f"")
+            display.clear_input()
             if pass_str in CODES and pass_str not in used_codes:
                 used_codes.append(pass_str)
                 step += 1
 
-                msg = json.dumps({
-                    "type": "progress_update",
-                    "room": ROOM,
-                    "step": step
-                }) + "\n"
-                writer.write(msg.encode())
-                await writer.drain()
+                msg = CODEC.progress(ROOM, step)
+                pending[(ROOM, step)] = msg
+                if connection is not None:
+                    connection.write(msg)
+                    await connection.drain()
             else:
                 safe_print(f"Invalid code or already used: {pass_str}")
                 continue
+        except ConnectionError as e:
+            safe_print(f"[send_progress] will resend after reconnect: {e}")
         except Exception as e:
             safe_print(f"[send_progress] error: {e}")
             break
 
-async def receive_updates(reader):
+def subscribe_list():
+    if OPPONENTS is None:
+        return None
+    return [ROOM] + OPPONENTS
+
+"""
+acknowledge()
+
+Forgets the pending updates which the daemon's state already reflects.
+"""
+def acknowledge():
+    done = mirror.step(ROOM)
+    for key in [key for key in pending if key[1] <= done]:
+        del pending[key]
+
+"""
+receive_updates(reader, writer)
+
+Applies the daemon's messages to the mirror and redraws the display, asking
+for a resync when an update was missed. Pings are answered with a pong. The
+daemon pings idle clients regularly, so hearing nothing for SILENCE_MAX seconds
+means the connection is dead, and the client gives up on it to reconnect.
+"""
+async def receive_updates(reader, writer):
     while True:
         try:
-            data = await reader.readline()
-            if not data:
+            msg = await asyncio.wait_for(
+                protocol.read_message(reader, mirror.names), SILENCE_MAX)
+            if msg is None:
                 safe_print("[receive_updates] connection closed.")
                 break
-            msg = json.loads(data.decode())
-            if msg["type"] == "state":
-                a = msg["data"]["A"]["step"]
-                b = msg["data"]["B"]["step"]
-                show_display(a, b)
+            if msg["type"] == "ping":
+                writer.write(CODEC.pong())
+            elif msg["type"] in ("state", "snapshot", "delta"):
+                if mirror.apply(msg):
+                    acknowledge()
+                    show_display(mirror.rooms)
+                else:
+                    writer.write(CODEC.resync())
+                    await writer.drain()
             else:
                 safe_print("[receive_updates] unknown message type")
+        except asyncio.TimeoutError:
+            safe_print("[receive_updates] daemon went silent.")
+            break
         except Exception as e:
             safe_print(f"[receive_updates] error: {e}")
             break
 
+"""
+maintain_connection()
+
+Keeps the client connected to the daemon. Each connection starts with a hello,
+which makes the daemon send a fresh snapshot, followed by every pending update
+in step order. The daemon ignores updates it has already applied, so replaying
+them is harmless. The first hello this client gets through also resets the
+room, since a client starting up means a new team starting at step 0. When
+the connection drops, reconnects are retried with exponential backoff, starting
+at BACKOFF_MIN and capped at BACKOFF_MAX.
+"""
+async def maintain_connection():
+    global connection, fresh
+    backoff = BACKOFF_MIN
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(LO, PORT)
+        except OSError as e:
+            if backoff == BACKOFF_MIN:
+                safe_print(f"[main] Failed to connect to daemon: {e}")
+            await asyncio.sleep(backoff * random.uniform(0.5, 1))
+            backoff = min(backoff * 2, BACKOFF_MAX)
+            continue
+        backoff = BACKOFF_MIN
+
+        try:
+            writer.write(protocol.encode_hello(ROOM, NUM_PINS, subscribe_list(),
+                                               CODEC.name, fresh))
+            for key in sorted(pending):
+                writer.write(pending[key])
+            await writer.drain()
+            fresh = False
+            connection = writer
+            await receive_updates(reader, writer)
+        except Exception as e:
+            safe_print(f"[main] Connection error: {e}")
+        finally:
+            connection = None
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+        safe_print("[main] Lost connection to daemon, reconnecting...")
+
 ################################################################################
 #  MAIN EXECUTABLE                                                             #
 ################################################################################
 
 async def main():
-    global ROOM
+    global ROOM, OPPONENTS, stdin
     if len(sys.argv) < 2:
-        safe_print("Usage: python3 room_client.py <room>")
+        safe_print("Usage: python3 room_client.py <room> [opponent ...]")
         sys.exit(1)
 
     ROOM = sys.argv[1].upper()
-    if ROOM not in ["A", "B"]:
-        safe_print("Room must be 'A' or 'B'")
-        sys.exit(1)
-
-    try:
-        reader, writer = await asyncio.open_connection(LO, PORT)
-    except Exception as e:
-        safe_print(f"[main] Failed to connect to daemon: {e}")
-        return
+    if len(sys.argv) > 2:
+        OPPONENTS = [name.upper() for name in sys.argv[2:]]
 
+    stdin = open_stdin()
     try:
-        send_task = asyncio.create_task(send_progress(writer))
-        recv_task = asyncio.create_task(receive_updates(reader))
+        send_task = asyncio.create_task(send_progress())
+        conn_task = asyncio.create_task(maintain_connection())
 
-        done, pending = await asyncio.wait(
-            [send_task, recv_task],
-            return_when=asyncio.FIRST_EXCEPTION
+        done, others = await asyncio.wait(
+            [send_task, conn_task],
+            return_when=asyncio.FIRST_COMPLETED
         )
 
         for task in done:
@@ -183,7 +408,7 @@ async def main():
             else:
                 safe_print("[main] Task completed normally.")
 
-        for task in pending:
+        for task in others:
             task.cancel()
             try:
                 await task
@@ -193,12 +418,7 @@ async def main():
     except Exception as e:
         safe_print(f"[main] Unexpected top-level error: {e}")
     finally:
-        try:
-            writer.close()
-            await writer.wait_closed()
-        except Exception as e:
-            safe_print(f"[main] Error during writer shutdown: {e}")
-
+        close_stdin()
         safe_print("Client exiting.")
         print_queue.put(None)
 
@@ -0,0 +1,121 @@
+################################################################################
+#                                                                              #
+#  rooms.py                                                                    #
+#                                                                              #
+#  This file defines the RoomRegistry class, which holds the progress of       #
+#  every escape room known to the leaderboard daemon. Rooms are registered     #
+#  by name when clients connect and are stored in parallel typed arrays        #
+#  addressed by a small integer index.                                         #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   05/24/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import time
+from array import array
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Number of pins in a room's lock when a client does not say otherwise
+DEFAULT_PINS = 4
+
+# Most rooms a registry holds, so that every index fits in 16 bits
+MAX_ROOMS = 0xFFFF
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+RoomRegistry class
+
+Stores the name, pin count, step, revision, and last update time of each room.
+Each room is given the next free index when it is registered, and all per-room
+values live in typed arrays at that index. A room's revision counts the changes
+made to it, which lets a client subscribed to only some rooms notice that it
+missed an update. seq counts changes across all rooms. records() copies rooms
+out as (index, name, step, pins, rev, updated) tuples, with updated given in
+seconds since the epoch or 0.0 if the room has never been updated. reserve()
+gives a name an index without counting as a change, as a placeholder for a room
+that is only subscribed to or whose registration is still on its way from a
+worker to its coordinator. A placeholder keeps revision 0, is left out of
+records() unless asked for by index, and is only counted as a change once it is
+registered. Registering more than MAX_ROOMS rooms raises ValueError.
+"""
+class RoomRegistry:
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.pins = array('H')
+        self.steps = array('H')
+        self.revs = array('I')
+        self.updated = array('d')
+        self.seq = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def register(self, name, pins=None):
+        idx = self.index.get(name)
+        if idx is None:
+            if len(self.names) >= MAX_ROOMS:
+                raise ValueError(f"more than {MAX_ROOMS} rooms")
+            idx = len(self.names)
+            self.names.append(name)
+            self.index[name] = idx
+            self.pins.append(DEFAULT_PINS if pins is None else pins)
+            self.steps.append(0)
+            self.revs.append(0)
+            self.updated.append(0.0)
+        elif self.revs[idx] and (pins is None or pins == self.pins[idx]):
+            return idx, False
+        elif pins is not None:
+            self.pins[idx] = pins
+        self._touch(idx)
+        return idx, True
+
+    def reserve(self, name, pins=None):
+        idx = self.index.get(name)
+        if idx is None:
+            idx, _ = self.register(name, pins)
+            self.revs[idx] = 0
+            self.seq -= 1
+        return idx
+
+    def update(self, name, step, when=None):
+        idx = self.index[name]
+        self.steps[idx] = step
+        self.updated[idx] = time.time() if when is None else when
+        self._touch(idx)
+        return idx
+
+    def restore(self, name, step, pins, rev, updated):
+        idx, _ = self.register(name, pins)
+        self.steps[idx] = step
+        self.pins[idx] = pins
+        self.revs[idx] = rev
+        self.updated[idx] = updated
+        return idx
+
+    def record(self, idx):
+        return (idx, self.names[idx], self.steps[idx], self.pins[idx],
+                self.revs[idx], self.updated[idx])
+
+    def records(self, indices=None):
+        if indices is None:
+            indices = [idx for idx, rev in enumerate(self.revs) if rev]
+        return [self.record(idx) for idx in indices]
+
+    def _touch(self, idx):
+        self.revs[idx] += 1
+        self.seq += 1
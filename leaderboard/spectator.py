@@ -0,0 +1,125 @@
+################################################################################
+#                                                                              #
+#  spectator.py                                                                #
+#                                                                              #
+#  This file defines a read-only HTTP endpoint for lobby screens which show    #
+#  the leaderboard without being a room. Screens poll it for the state of      #
+#  every room as JSON. The response is encoded once per change to the rooms    #
+#  and the same bytes are sent to every request until the next change.         #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Date:   06/14/2025                                                          #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import asyncio
+import json
+import os
+
+from metrics import METRICS
+from protocol import json_entries
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Seconds a connection may sit idle between requests before it is closed
+IDLE_TIMEOUT = 30
+
+# Paths which return the leaderboard state
+STATE_PATHS = ("/", "/state")
+
+################################################################################
+#  METRICS                                                                     #
+################################################################################
+
+REQUESTS     = METRICS.counter("spectator_requests")
+NOT_MODIFIED = METRICS.counter("spectator_not_modified")
+ENCODES      = METRICS.counter("spectator_encodes")
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Spectator class
+
+Serves the rooms of a RoomRegistry over plain HTTP. A GET of / or /state
+returns {"seq": ..., "rooms": {...}}, with the rooms in the same form as the
+data of a JSON snapshot. The whole response, headers included, is built the
+first time it is asked for after the registry's seq changes, and reused until
+it changes again. Each response carries an ETag made of the seq and a token
+drawn when the Spectator is made, so a screen sending If-None-Match gets an
+empty 304 until there is something new to show, and a tag from before a
+restart, which may have counted seq up from 0 again, never matches.
+Connections are kept alive between requests unless the client asks otherwise.
+"""
+class Spectator:
+    def __init__(self, registry):
+        self.registry = registry
+        self._boot = os.urandom(4).hex()
+        self._seq = None
+        self._etag = None
+        self._response = None
+        self._not_modified = None
+
+    async def serve(self, host, port):
+        return await asyncio.start_server(self._handle, host, port)
+
+    def response(self, etag=None):
+        if self._seq != self.registry.seq:
+            self._encode()
+        if etag == self._etag:
+            NOT_MODIFIED.inc()
+            return self._not_modified
+        return self._response
+
+    def _encode(self):
+        ENCODES.inc()
+        self._seq = self.registry.seq
+        self._etag = f'"{self._boot}-{self._seq}"'
+        body = json.dumps({"seq": self._seq,
+                           "rooms": json_entries(self.registry.records())},
+                          separators=(",", ":")).encode()
+        self._response = (b"HTTP/1.1 200 OK\r\n"
+                          b"Content-Type: application/json\r\n"
+                          b"Cache-Control: no-cache\r\n" +
+                          f"ETag: {self._etag}\r\n"
+                          f"Content-Length: {len(body)}\r\n\r\n".encode() +
+                          body)
+        self._not_modified = (b"HTTP/1.1 304 Not Modified\r\n" +
+                              f"ETag: {self._etag}\r\n\r\n".encode())
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                              IDLE_TIMEOUT)
+                REQUESTS.inc()
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, version = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                if method != "GET":
+                    writer.write(b"HTTP/1.1 405 Method Not Allowed\r\n"
+                                 b"Allow: GET\r\nContent-Length: 0\r\n\r\n")
+                elif path.split("?", 1)[0] not in STATE_PATHS:
+                    writer.write(b"HTTP/1.1 404 Not Found\r\n"
+                                 b"Content-Length: 0\r\n\r\n")
+                else:
+                    writer.write(self.response(headers.get("if-none-match")))
+                await writer.drain()
+                connection = headers.get("connection", "").lower()
+                if connection == "close" or (version == "HTTP/1.0" and
+                                             connection != "keep-alive"):
+                    break
+        except Exception:
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,328 @@
+################################################################################
+#                                                                              #
+#  analysis.py                                                                 #
+#                                                                              #
+#  This module checks that a Swamp Adventure board can be won before anyone    #
+#  plays it. It searches every state a player can get the board into, moving   #
+#  around the walls and through the minigames, for the shortest way to reach   #
+#  the exit with the cheese, and reports any cell the game would trip over.    #
+#  Results are cached by the contents of the board file.                       #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Revised: 06/18/2025                                                         #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+
+from block_print import PACKAGE_PATH
+from gameboard import GameBoard, MINIGAMES, START, EXIT, ACTION, WALL
+from minigames import *
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Outcomes a player can choose to get from each minigame. Deaths are left out,
+# as no winning route goes through one.
+OUTCOMES = {
+    pub:           (ReturnCode.SHREK_WHISTLE, ReturnCode.SUCCESS,
+                    ReturnCode.BACK),
+    lily_pads:     (ReturnCode.SUCCESS, ReturnCode.BACK),
+    troll:         (ReturnCode.SUCCESS, ReturnCode.BACK),
+    cheese_nearby: (None,),
+    cheese:        (ReturnCode.CHEESE,),
+    base_three:    (ReturnCode.SUCCESS, ReturnCode.BACK),
+    deadend:       (ReturnCode.BACK,),
+    wizard:        (ReturnCode.SPELL,),
+}
+
+# Outcomes which leave the player standing in the minigame's cell
+STAY = (ReturnCode.SUCCESS, None)
+
+# Steps taken by the player for each move key
+MOVES = {"w": (0, 1), "a": (-1, 0), "s": (0, -1), "d": (1, 0)}
+
+# File holding the analyses of every board analyzed so far, by digest
+CACHE_FILE = os.path.join(PACKAGE_PATH, "game_data", "analysis.json")
+
+################################################################################
+#  GLOBALS                                                                     #
+################################################################################
+
+# Analyses made or loaded by this process, by digest
+ANALYSES = {}
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Analysis class
+
+The result of analyzing a board. solvable tells whether the exit can be reached
+with the cheese, and route is then the shortest sequence of move keys which
+does so for a player making the right choices, or None. reachable lists every
+cell the player can stand in, and cheese whether the cheese can be found at
+all. problems describes mistakes in the layout, such as an action cell with no
+minigame, which the game would fail on and the search treats as a wall, and
+states counts the states searched.
+"""
+class Analysis:
+    def __init__(self, solvable, route, reachable, cheese, problems, states):
+        self.solvable = solvable
+        self.route = route
+        self.reachable = reachable
+        self.cheese = cheese
+        self.problems = problems
+        self.states = states
+
+    def to_dict(self):
+        return {"solvable": self.solvable, "route": self.route,
+                "reachable": sorted(self.reachable), "cheese": self.cheese,
+                "problems": self.problems, "states": self.states}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["solvable"], data["route"],
+                   {tuple(cell) for cell in data["reachable"]},
+                   data["cheese"], data["problems"], data["states"])
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+analyze(board)
+
+Searches the states a player can bring the given GameBoard into, breadth first
+from its start, and returns an Analysis. A state is the player's cell, whether
+they hold the cheese and the whistle, and which of the minigames that matter
+they have used up. Minigames which can only be passed through, like the troll,
+leave the board as it was whichever way they go, and minigames which can only
+send the player back, like the dead end, can never be passed, so neither needs
+remembering. The rest, which give an item or cast a spell, become open ground
+once played, and one bit each records whether they have been. The wizard is
+why: its spell sends the player back to the start, and only once it has been
+cast can its cell, and the exit behind it, be walked through. Shrek is left
+out, since running from him only ever sends the player back to the start.
+"""
+def analyze(board):
+    width, height = board.width, board.height
+    minigames, start, exit = board.minigames, board.start, board.exit
+    problems = []
+    for (x, y), game in minigames.items():
+        if not (0 <= x < width and 0 <= y < height):
+            problems.append(f"{game.__name__} at {(x, y)} is off the board")
+        elif board.cells[x * height + y] != ACTION:
+            problems.append(f"{game.__name__} at {(x, y)} is not on an "
+                            "action cell")
+
+    # Sort every cell into open ground, a wall, or a minigame to be remembered
+    games = {x * height + y: game for (x, y), game in minigames.items()
+             if 0 <= x < width and 0 <= y < height}
+    blocked = bytearray(width * height)
+    tracked = {}
+    for i, code in enumerate(board.cells):
+        if code == WALL:
+            blocked[i] = True
+        elif code == ACTION and i != start[0] * height + start[1]:
+            cell = divmod(i, height)
+            game = games.get(i)
+            if game is None:
+                problems.append(f"Action cell at {cell} has no minigame")
+                blocked[i] = True
+            elif game not in OUTCOMES:
+                problems.append(f"{game.__name__} at {cell} has no known "
+                                "outcomes")
+                blocked[i] = True
+            elif all(outcome == ReturnCode.BACK for outcome in OUTCOMES[game]):
+                blocked[i] = True
+            elif not all(outcome in STAY or outcome == ReturnCode.BACK
+                         for outcome in OUTCOMES[game]):
+                tracked[i] = (1 << len(tracked), OUTCOMES[game])
+
+    # Breadth first search over (cell, cheese, whistle, used minigames)
+    first = (start[0] * height + start[1], False, False, 0)
+    parents = {first: None}
+    reachable = set()
+    cheese = False
+    goal = None
+    queue = deque([first])
+    while queue:
+        state = queue.popleft()
+        here, has_cheese, has_whistle, used = state
+        x, y = divmod(here, height)
+        reachable.add((x, y))
+        cheese = cheese or has_cheese
+        for key, (dx, dy) in MOVES.items():
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < width and 0 <= ny < height):
+                continue
+            i = nx * height + ny
+            if blocked[i]:
+                continue
+            game = tracked.get(i)
+            if game is None or used & game[0]:
+                nexts = ((i, has_cheese, has_whistle, used),)
+            else:
+                bit, outcomes = game
+                nexts = []
+                for outcome in outcomes:
+                    if outcome in STAY:
+                        nexts.append((i, has_cheese, has_whistle, used | bit))
+                    elif outcome == ReturnCode.CHEESE:
+                        nexts.append((i, True, has_whistle, used | bit))
+                    elif outcome == ReturnCode.SHREK_WHISTLE:
+                        nexts.append((i, has_cheese, True, used | bit))
+                    elif outcome == ReturnCode.SPELL:
+                        nexts.append((first[0], has_cheese, has_whistle,
+                                      used | bit))
+            for after in nexts:
+                if after in parents:
+                    continue
+                parents[after] = (state, key)
+                if (goal is None and after[1] and
+                        divmod(after[0], height) == exit):
+                    goal = after
+                queue.append(after)
+
+    route = None
+    if goal is not None:
+        keys = []
+        state = goal
+        while parents[state] is not None:
+            state, key = parents[state]
+            keys.append(key)
+        route = "".join(reversed(keys))
+    return Analysis(goal is not None, route, reachable, cheese, problems,
+                    len(parents))
+
+
+"""
+digest(src, width, height, minigames, start, exit)
+
+Returns a hex digest of the board file at src together with everything else its
+analysis depends on: the size of the board, where the minigames are, and the
+start and exit cells.
+"""
+def digest(src, width, height, minigames=MINIGAMES, start=START, exit=EXIT):
+    sha = hashlib.sha256()
+    with open(src, "rb") as f:
+        sha.update(f.read())
+    layout = sorted((x, y, game.__name__) for (x, y), game in minigames.items())
+    sha.update(repr((width, height, layout, start, exit)).encode())
+    return sha.hexdigest()
+
+
+"""
+analyze_file(src, width, height, minigames, start, exit, cache)
+
+Returns the Analysis of the board file at src, analyzing it only the first
+time its digest is seen. Analyses are kept in ANALYSES and in the JSON file at
+cache, so a board which has been analyzed once, by any process, loads with a
+hash of its file and a lookup. The cache file is rewritten whole when a new
+board is analyzed; if it cannot be written the analysis is kept in memory only.
+"""
+def analyze_file(src, width, height, minigames=MINIGAMES, start=START,
+                 exit=EXIT, cache=CACHE_FILE):
+    key = digest(src, width, height, minigames, start, exit)
+    analysis = ANALYSES.get(key)
+    if analysis is not None:
+        return analysis
+    stored = load_cache(cache)
+    if key in stored:
+        analysis = Analysis.from_dict(stored[key])
+    else:
+        analysis = analyze(GameBoard(width, height, src=src,
+                                     minigames=minigames, start=start,
+                                     exit=exit))
+        stored[key] = analysis.to_dict()
+        save_cache(cache, stored)
+    ANALYSES[key] = analysis
+    return analysis
+
+
+"""
+load_cache(cache)
+
+Returns the analyses stored in the cache file, or none if there is no readable
+cache file.
+"""
+def load_cache(cache):
+    if cache is None:
+        return {}
+    try:
+        with open(cache, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+"""
+save_cache(cache, stored)
+
+Writes the stored analyses to the cache file, replacing it in one step so that
+a reader never sees it half written.
+"""
+def save_cache(cache, stored):
+    if cache is None:
+        return
+    try:
+        with open(cache + ".tmp", "w") as f:
+            json.dump(stored, f)
+        os.replace(cache + ".tmp", cache)
+    except OSError:
+        pass
+
+
+"""
+draw(analysis, width, height)
+
+Returns a map of the board with every cell the player can reach marked.
+"""
+def draw(analysis, width, height):
+    rows = []
+    for y in reversed(range(height)):
+        rows.append(" ".join("o" if (x, y) in analysis.reachable else "."
+                             for x in range(width)))
+    return "\n".join(rows)
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+if __name__ == "__main__":
+    from gameloop import BOARD_FILE, board_layout
+
+    parser = argparse.ArgumentParser(description="Check that a Swamp "
+                                     "Adventure board can be won")
+    parser.add_argument("board", nargs="?", default=BOARD_FILE,
+                        help="Board file to analyze")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Analyze the board even if it has been before")
+    args = parser.parse_args()
+
+    layout = board_layout(args.board)
+    start = time.perf_counter()
+    analysis = analyze_file(args.board, **layout,
+                            cache=None if args.no_cache else CACHE_FILE)
+    elapsed = time.perf_counter() - start
+    for problem in analysis.problems:
+        print(f"Problem: {problem}")
+    print(f"Solvable: {'yes' if analysis.solvable else 'no'}")
+    print(f"Cheese reachable: {'yes' if analysis.cheese else 'no'}")
+    if analysis.route is not None:
+        print(f"Shortest route: {len(analysis.route)} moves, "
+              f"{analysis.route}")
+    print(draw(analysis, layout["width"], layout["height"]))
+    print(f"{analysis.states} states in {elapsed * 1000:.1f} ms")
@@ -11,40 +11,97 @@
 #                                                                              #
 ################################################################################
 
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import os
+
+from gameio import CONSOLE
+
 ################################################################################
 #  CONSTANTS                                                                   #
 ################################################################################
 
+# Directory of this package, which the asset paths are relative to
+PACKAGE_PATH = os.path.dirname(os.path.abspath(__file__))
+
 # Paths to the ascii art files
-ASCII_PATH      = "./ascii/"
+ASCII_PATH      = os.path.join(PACKAGE_PATH, "ascii", "")
 ASCII_extension = "_ascii.txt"
 
 # Paths to pre-written messages
-TEXT_PATH       = "./msgs/"
+TEXT_PATH       = os.path.join(PACKAGE_PATH, "msgs", "")
 TEXT_extension  = ".txt"
 
+################################################################################
+#  GLOBALS                                                                     #
+################################################################################
+
+# Contents of every asset file read so far, keyed by path
+ASSETS = {}
+
 ################################################################################
 #  FUNCTIONS                                                                   #
 ################################################################################
 
 """
-print_ascii_art(art_name)
+load_asset(path)
+
+Returns the contents of an asset file, reading it only the first time it is
+asked for. Later calls are served from ASSETS without touching the disk.
+"""
+def load_asset(path):
+    text = ASSETS.get(path)
+    if text is None:
+        with open(path, "r") as f:
+            text = f.read()
+        ASSETS[path] = text
+    return text
+
+
+"""
+preload()
+
+Reads every ascii art and message file into ASSETS up front, so that no file is
+read once the game is under way.
+"""
+def preload():
+    for directory in (ASCII_PATH, TEXT_PATH):
+        for name in os.listdir(directory):
+            if name.endswith(".txt"):
+                load_asset(directory + name)
+
+
+"""
+invalidate(path)
+
+Forgets the cached contents of the asset file at path, or of every asset if no
+path is given, so that edited files are read again on their next use.
+"""
+def invalidate(path=None):
+    if path is None:
+        ASSETS.clear()
+    else:
+        ASSETS.pop(path, None)
+
+
+"""
+print_ascii_art(art_name, io)
 
 Prints the ascii art from the file containing art by the given name. Ascii file
 paths are constructed as ASCII_PATH + art_name + ASCII_extension.
 """
-def print_ascii_art(art_name):
-    with open(ASCII_PATH + art_name + ASCII_extension, "r") as f:
-        print(f.read())
+def print_ascii_art(art_name, io=CONSOLE):
+    io.print(load_asset(ASCII_PATH + art_name + ASCII_extension))
 
 
 """
-print_msg(msg_name)
+print_msg(msg_name, io)
 
 Prints the pre-written message from the file containing the message by the given
 name. Message file paths are constructed as TEXT_PATH + msg_name +
 TEXT_extension.
 """
-def print_msg(msg_name):
-    with open(TEXT_PATH + msg_name + TEXT_extension, "r") as f:
-        print(f.read())
+def print_msg(msg_name, io=CONSOLE):
+    io.print(load_asset(TEXT_PATH + msg_name + TEXT_extension))
@@ -17,8 +17,12 @@
 #  IMPORTS                                                                     #
 ################################################################################
 
+import os
 import random
+from array import array
+from collections import deque
 
+from gameio import CONSOLE
 from gamespace import GameSpace, CellType
 from minigames import *
 
@@ -38,6 +42,34 @@ MINIGAMES = {
     (9, 2): wizard,
 }
 
+# Minigames by the name they are given in layout files
+MINIGAME_NAMES = {game.__name__: game for game in MINIGAMES.values()}
+
+# Cell the player starts in, and is sent back to by spells
+START = (0, 0)
+
+# Cell the player escapes the swamp from once they have the cheese
+EXIT = (9, 0)
+
+# Extension of the layout file which may sit beside a board file
+LAYOUT_EXTENSION = ".map"
+
+# Codes stored for each cell type character of a board file
+CELL_CODES = bytes.maketrans(b"EWA", bytes([CellType.EMPTY.value,
+                                            CellType.WALL.value,
+                                            CellType.ACTION.value]))
+
+# The stored codes of passable and impassable cells
+EMPTY  = CellType.EMPTY.value
+WALL   = CellType.WALL.value
+ACTION = CellType.ACTION.value
+
+# How a visited cell of each type is drawn
+GLYPHS = {EMPTY: "     ", WALL: "  X  ", ACTION: "  ✓  "}
+
+# Most chase steps memoised at once before the memo is emptied
+MAX_CHASE_STEPS = 4096
+
 ################################################################################
 #  CLASS DEFINITIONS                                                           #
 ################################################################################
@@ -46,96 +78,196 @@ MINIGAMES = {
 GameBoard class
 
 Represents the game board for the Swamp Adventure game. The board is a grid of
-GameSpace objects, each representing a cell in the game world. The GameBoard
-class includes methods for initializing the board, moving the player and Shrek
-around on it, and displaying the board in any given configuration.
+cells, each representing a cell in the game world. The GameBoard class includes
+methods for initializing the board, moving the player and Shrek around on it,
+and displaying the board in any given configuration.
+
+The cells are stored flat, indexed by x * height + y: cells holds the CellType
+value of every cell and visited a flag for each, both as bytearrays, while
+actions maps only the indices of action cells to their minigames. space(x, y)
+returns a GameSpace view of a single cell. A board file is read a line at a
+time and translated to cell codes in one call per line. src is the path of a
+board file, or the lines of one, such as those of a generated board. Which
+minigame sits in which cell, where the player starts, and where the exit is are
+given by minigames, start, and exit, and default to the original swamp's.
+
+Rendering is cached by row. rows holds the drawn text of each row of cells, and
+a row is only drawn again once it is marked in dirty, which happens whenever a
+cell in it is visited and, when the board is next drawn, for the rows the
+player and Shrek were drawn in and have moved to. Each frame is then one join
+of the cached rows, however large the board.
+
+Shrek chases the player along shortest paths around the walls. No next-step
+table is built ahead of time, as one covering every pair of cells would not fit
+in memory for a large board. Instead, on each turn Shrek chases, chase_step()
+runs a breadth first search out from Shrek's cell which stops as soon as it
+reaches the player, so a chase costs only the cells nearer to Shrek than the
+player is, and returns the index, x * height + y, of Shrek's first step along
+the path. The step found is memoised in chase_steps by the pair of cells, each
+entry a single number, so only a pair seen before is answered without a
+search, and the memo is emptied whenever a cell changes type.
+
+Chance and the console are both given to the board. rng supplies Shrek's random
+steps, and is the random module unless a seeded random.Random is given, and io
+is the gameio interface the board and its minigames talk to the player through.
+scene is the minigame being played while one runs, or shrek_encounter while
+Shrek is met, so a scripted player can tell the prompts of each apart, and
+encounters counts how many times Shrek has been met.
 """
 class GameBoard:
-    def __init__(self, width: int, height: int, src=None):
+    def __init__(self, width: int, height: int, src=None, rng=None, io=None,
+                 minigames=MINIGAMES, start=START, exit=EXIT):
         self.width = width
         self.height = height
+        self.minigames = minigames
+        self.start = start
+        self.exit = exit
+        self.rng = rng if rng is not None else random
+        self.io = io if io is not None else CONSOLE
+        self.scene = None
+        self.encounters = 0
         self.has_cheese = False
         self.has_whistle = False
-        self.board = [[GameSpace(CellType.EMPTY, x, y) for y in
-                        range(height)] for x in range(width)]
-        if src is not None:
+        self.cells = bytearray(width * height)
+        self.visited = bytearray(width * height)
+        self.actions = {}
+        if isinstance(src, (str, os.PathLike)):
             # Read in the types of cells from the source file
-            with open(src, "r") as f:
-                for x, line in enumerate(f.readlines()):
-                    for y, char in enumerate(line.strip()):
-                        if char == "E":
-                            self.board[x][y] = GameSpace(CellType.EMPTY, x, y)
-                        elif char == "W":
-                            self.board[x][y] = GameSpace(CellType.WALL, x, y)
-                        elif char == "A":
-                            self.board[x][y] = GameSpace(CellType.ACTION, x, y)
-                        else:
-                            raise ValueError(f"Unknown cell type: {char}")
-        for x, y in MINIGAMES:
-            self.board[x][y].action = MINIGAMES[(x, y)]
-        self.player_pos = (0, 0)
+            with open(src, "rb") as f:
+                self._load(f)
+        elif src is not None:
+            self._load(src)
+        for x, y in minigames:
+            self.actions[x * height + y] = minigames[(x, y)]
+        self.player_pos = start
         self.shrek_pos = (round(width / 2), height - 1)
-        self.board[self.player_pos[0]][self.player_pos[1]].visited = True
+        self.visited[self.player_pos[0] * height + self.player_pos[1]] = True
+        self.chase_steps = {}
+        self.rows = [None] * height
+        self.dirty = set()
+        self.drawn = ()
+
+    def _load(self, lines):
+        width, height = self.width, self.height
+        for x, line in enumerate(lines):
+            row = line.strip()
+            unknown = row.translate(None, b"EWA")
+            if unknown:
+                raise ValueError(f"Unknown cell type: {chr(unknown[0])}")
+            if x >= width or len(row) > height:
+                raise ValueError("Board file does not fit a "
+                                 f"{width}x{height} board")
+            self.cells[x * height:x * height + len(row)] = \
+                row.translate(CELL_CODES)
+
+    def space(self, x: int, y: int):
+        return GameSpace(self, x, y)
 
     def move_player(self, dx: int, dy: int):
         old_pos = self.player_pos
         new_x = self.player_pos[0] + dx
         new_y = self.player_pos[1] + dy
         if 0 <= new_x < self.width and 0 <= new_y < self.height:
-            if self.board[new_x][new_y].cell_type == CellType.WALL:
-                self.board[new_x][new_y].visited = True
-                print("You can't go that way! The foliage is too thick...")
+            new_i = new_x * self.height + new_y
+            self.dirty.add(new_y)
+            if self.cells[new_i] == WALL:
+                self.visited[new_i] = True
+                self.io.print("You can't go that way! The foliage is too thick...")
             else:
                 self.player_pos = (new_x, new_y)
-                if (self.board[new_x][new_y].cell_type == CellType.ACTION and
-                   not self.board[new_x][new_y].visited):
-                    result = self.board[new_x][new_y].action()
-                    self.board[new_x][new_y].visited = True
+                if self.cells[new_i] == ACTION and not self.visited[new_i]:
+                    self.scene = self.actions[new_i]
+                    result = self.scene(self.io)
+                    self.visited[new_i] = True
                     match result:
                         case ReturnCode.DEATH:
-                            print("You died! Game over.")
+                            self.io.print("You died! Game over.")
                             raise ValueError("Death")
                         case ReturnCode.BACK:
-                            self.board[new_x][new_y].visited = False
+                            self.visited[new_i] = False
                             self.player_pos = old_pos
                         case ReturnCode.SPELL:
-                            self.player_pos = (0, 0)
+                            self.player_pos = self.start
                         case ReturnCode.CHEESE:
                             self.has_cheese = True
                         case ReturnCode.SHREK_WHISTLE:
                             self.has_whistle = True
                 else:
-                    self.board[new_x][new_y].visited = True
+                    self.visited[new_i] = True
             if self.player_pos == self.shrek_pos:
-                res = shrek_encounter(self.has_whistle)
+                self.encounters += 1
+                self.scene = shrek_encounter
+                res = shrek_encounter(self.has_whistle, self.io)
                 if res == ReturnCode.DEATH:
-                    print("You died! Game over.")
+                    self.io.print("You died! Game over.")
                     raise ValueError("Death")
                 elif res == ReturnCode.SPELL:
-                    self.player_pos = (0, 0)
-            if self.player_pos == (9, 0):
+                    self.player_pos = self.start
+            self.scene = None
+            if self.player_pos == self.exit:
                 if self.has_cheese:
-                    print("You have made it to the exit with the cheese! You have escaped the swamp. Congratulations.")
+                    self.io.print("You have made it to the exit with the cheese! You have escaped the swamp. Congratulations.")
                     return True
                 else:
-                    print("You have made it to the exit without the cheese! You have not escaped the swamp. Go back and find your cheese.")
+                    self.io.print("You have made it to the exit without the cheese! You have not escaped the swamp. Go back and find your cheese.")
 
         else:
-            print("Are you stupid? Do you know how to read a map?\n")
+            self.io.print("Are you stupid? Do you know how to read a map?\n")
 
     def move_shrek_step(self, dx: int, dy: int):
         new_x = self.shrek_pos[0] + dx
         new_y = self.shrek_pos[1] + dy
         if (0 <= new_x < self.width and 0 <= new_y < self.height and
-                           self.board[new_x][new_y].cell_type != CellType.WALL):
+                           self.cells[new_x * self.height + new_y] != WALL):
             self.shrek_pos = (new_x, new_y)
 
+    def chase_step(self, source, target):
+        key = (source, target)
+        step = self.chase_steps.get(key)
+        if step is None:
+            if len(self.chase_steps) >= MAX_CHASE_STEPS:
+                self.chase_steps.clear()
+            step = self._search(source, target)
+            self.chase_steps[key] = step
+        return step
+
+    def _search(self, source, target):
+        height = self.height
+        start = source[0] * height + source[1]
+        goal = target[0] * height + target[1]
+        if start == goal:
+            return start
+        cells = self.cells
+        parents = array('i', [-1]) * len(cells)
+        parents[start] = start
+        queue = deque([start])
+        while queue:
+            here = queue.popleft()
+            y = here % height
+            # The cells beside this one, right, left, up, and down, with -1
+            # standing in for those off the top or bottom of the board
+            for i in (here + height, here - height,
+                      here + 1 if y < height - 1 else -1, here - 1 if y else -1):
+                if 0 <= i < len(cells) and cells[i] != WALL and parents[i] < 0:
+                    parents[i] = here
+                    if i == goal:
+                        # Walk back to the step taken out of the start cell
+                        while parents[i] != start:
+                            i = parents[i]
+                        return i
+                    queue.append(i)
+        return -1
+
     def move_shrek(self):
         # Generate a movement of the shrek which is either a step towards the
-        # player in the x or y direction, or a random step, with probability
-        # 60/40 for each.
-        if random.random() < 0.6:
-            if (abs(self.shrek_pos[0] - self.player_pos[0]) >
+        # player along a shortest path, or a random step, with probability
+        # 60/40 for each. Where no path reaches the player, the step towards
+        # them is taken in the x or y direction instead.
+        if self.rng.random() < 0.6:
+            step = self.chase_step(self.shrek_pos, self.player_pos)
+            if step >= 0:
+                self.shrek_pos = divmod(step, self.height)
+            elif (abs(self.shrek_pos[0] - self.player_pos[0]) >
                                    abs(self.shrek_pos[1] - self.player_pos[1])):
                 if self.shrek_pos[0] < self.player_pos[0]:
                     self.move_shrek_step(1, 0)
@@ -147,31 +279,77 @@ class GameBoard:
                 else:
                     self.move_shrek_step(0, -1)
         else:
-            dx = random.choice([-1, 0, 1])
-            dy = random.choice([-1, 0, 1])
+            dx = self.rng.choice([-1, 0, 1])
+            dy = self.rng.choice([-1, 0, 1])
             self.move_shrek_step(dx, dy)
 
     def __str__(self):
-        board_str = ""
-        for y in range(self.height - 1, -1, -1):
-            board_str += "=" * (self.width * 6 + 1) + "\n"
-            board_str += "|     " * self.width + "|\n"
-            for x in range(self.width):
-                board_str += "|"
-                if (x, y) == self.player_pos:
-                    board_str += "  ■  "
-                elif (x, y) == self.shrek_pos:
-                    board_str += "  S  "
-                elif self.board[x][y].visited:
-                    if self.board[x][y].cell_type == CellType.WALL:
-                        board_str += "  X  "
-                    elif self.board[x][y].cell_type == CellType.ACTION:
-                        board_str += "  ✓  "
-                    elif self.board[x][y].cell_type == CellType.EMPTY:
-                        board_str += "     "
-                else:
-                    board_str += "  ?  "
-            board_str += "|\n"
-            board_str += "|     " * self.width + "|\n"
-        board_str += "=" * (self.width * 6 + 1) + "\n"
-        return board_str
+        marks = (self.player_pos, self.shrek_pos)
+        for _, y in self.drawn + marks:
+            self.dirty.add(y)
+        self.drawn = marks
+        rule = "=" * (self.width * 6 + 1) + "\n"
+        spacer = "|     " * self.width + "|\n"
+        for y in range(self.height):
+            if y in self.dirty or self.rows[y] is None:
+                self.rows[y] = rule + spacer + self._draw_row(y) + spacer
+        self.dirty.clear()
+        return "".join(reversed(self.rows)) + rule
+
+    def _draw_row(self, y: int):
+        cells = []
+        for x in range(self.width):
+            i = x * self.height + y
+            if (x, y) == self.player_pos:
+                cells.append("  ■  ")
+            elif (x, y) == self.shrek_pos:
+                cells.append("  S  ")
+            elif self.visited[i]:
+                cells.append(GLYPHS[self.cells[i]])
+            else:
+                cells.append("  ?  ")
+        return "|" + "|".join(cells) + "|\n"
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+layout_path(src)
+
+Returns the path of the layout file which goes with the board file at src.
+"""
+def layout_path(src):
+    return os.path.splitext(src)[0] + LAYOUT_EXTENSION
+
+
+"""
+read_layout(src)
+
+Reads the layout file which goes with the board file at src, if there is one,
+and returns what it gives as keyword arguments for GameBoard. Each line of a
+layout file is a name and two numbers: "size" followed by the width and height
+of the board, "start" or "exit" followed by the cell of the start or the exit,
+or the name of a minigame followed by the cell it sits in. Returns no arguments
+when there is no layout file, leaving the board with the original swamp's.
+"""
+def read_layout(src):
+    try:
+        f = open(layout_path(src), "r")
+    except FileNotFoundError:
+        return {}
+    layout = {"minigames": {}}
+    with f:
+        for line in f:
+            if not line.strip():
+                continue
+            name, a, b = line.split()
+            if name == "size":
+                layout["width"], layout["height"] = int(a), int(b)
+            elif name in ("start", "exit"):
+                layout[name] = (int(a), int(b))
+            elif name in MINIGAME_NAMES:
+                layout["minigames"][(int(a), int(b))] = MINIGAME_NAMES[name]
+            else:
+                raise ValueError(f"Unknown minigame: {name}")
+    return layout
@@ -0,0 +1,66 @@
+################################################################################
+#                                                                              #
+#  gameio.py                                                                   #
+#                                                                              #
+#  This module contains the console interfaces the game talks to the player    #
+#  through. Every prompt and every line of text in the game goes through one   #
+#  of these, so the game can be played at the terminal or driven by a script   #
+#  with no terminal at all.                                                    #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Revised: 06/16/2025                                                         #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Console class
+
+Talks to the player through the terminal with the builtin input() and print().
+"""
+class Console:
+    def input(self, prompt=""):
+        return input(prompt)
+
+    def print(self, *args, **kwargs):
+        print(*args, **kwargs)
+
+
+"""
+ScriptedIO class
+
+Plays the game without a terminal. answers is either an iterable of lines,
+which are returned to the prompts in order, or a callable taking the prompt and
+returning the line to answer it with. Running out of lines raises EOFError, as
+input() does at the end of its input. Printed text is thrown away without being
+formatted, so a board passed to print() is never even drawn. prompts counts the
+prompts answered so far.
+"""
+class ScriptedIO:
+    def __init__(self, answers):
+        if callable(answers):
+            self.answer = answers
+        else:
+            lines = iter(answers)
+            self.answer = lambda prompt: next(lines)
+        self.prompts = 0
+
+    def input(self, prompt=""):
+        self.prompts += 1
+        try:
+            return self.answer(prompt)
+        except StopIteration:
+            raise EOFError("No scripted answer left") from None
+
+    def print(self, *args, **kwargs):
+        pass
+
+################################################################################
+#  GLOBALS                                                                     #
+################################################################################
+
+# The terminal, used wherever no other interface is given
+CONSOLE = Console()
@@ -14,10 +14,16 @@
 #  IMPORTS                                                                     #
 ################################################################################
 
+import argparse
+import os
+import sys
 import time
 
 import block_print as bp
-from gameboard import GameBoard
+from analysis import analyze_file
+from gameboard import GameBoard, read_layout
+from gameio import CONSOLE
+from generate import generate
 
 ################################################################################
 #  CONSTANTS                                                                   #
@@ -26,50 +32,73 @@ from gameboard import GameBoard
 BOARD_WIDTH  = 10
 BOARD_HEIGHT = 5
 
+# The board file the game is played on
+BOARD_FILE = os.path.join(bp.PACKAGE_PATH, "game_data", "init.dat")
+
+# Steps taken by the player for each move key
+MOVES = {"w": (0, 1), "a": (-1, 0), "s": (0, -1), "d": (1, 0)}
+
 ################################################################################
 #  FUNCTIONS                                                                   #
 ################################################################################
 
 """
-game_loop()
+game_loop(io, rng, gb)
 
 The main game loop for the Swamp Adventure text-based adventure game. Each turn
 the player is presented with a prompt and their input is processed. The game
-continues until the player reaches one of the possible ends of the game.
+continues until the player reaches one of the possible ends of the game. The
+game is played through the given gameio interface, the terminal by default,
+with Shrek's moves drawn from rng. gb is the GameBoard to play on, made with
+the same interface; by default it is the board in BOARD_FILE.
 """
-def game_loop():
+def game_loop(io=CONSOLE, rng=None, gb=None):
     # Print the game intro
-    bp.print_ascii_art("shrek")
-    bp.print_msg("intro")
+    bp.print_ascii_art("shrek", io)
+    bp.print_msg("intro", io)
 
     # Initialize the game board
-    gb = GameBoard(BOARD_WIDTH, BOARD_HEIGHT, src="game_data/init.dat")
+    if gb is None:
+        gb = GameBoard(src=BOARD_FILE, rng=rng, io=io,
+                       **board_layout(BOARD_FILE))
 
     # Main game loop
-    while True:
-        # Display the game board
-        print(gb)
-
-        # Move the shrek
-        gb.move_shrek()
-
-        # Get player input and move the player
-        move = input("Enter your move (w/a/s/d): ").strip().lower()
-        print()
-        res = None
-        if move == "w":
-            res = gb.move_player(0, 1)
-        elif move == "a":
-            res = gb.move_player(-1, 0)
-        elif move == "s":
-            res = gb.move_player(0, -1)
-        elif move == "d":
-            res = gb.move_player(1, 0)
-        else:
-            print("Invalid input. Please enter w/a/s/d.")
+    while take_turn(gb) is None:
+        pass
+
+
+"""
+board_layout(src)
+
+Returns the keyword arguments for a GameBoard on the board file at src: those
+given by the layout file beside it, and otherwise the size of the original
+swamp.
+"""
+def board_layout(src):
+    return {"width": BOARD_WIDTH, "height": BOARD_HEIGHT, **read_layout(src)}
 
-        if res is not None:
-            break
+
+"""
+take_turn(gb)
+
+Plays a single turn on the given board: displays it, moves Shrek, and moves the
+player by the key they enter. Returns True once the player has escaped, and
+raises ValueError if they die.
+"""
+def take_turn(gb):
+    # Display the game board
+    gb.io.print(gb)
+
+    # Move the shrek
+    gb.move_shrek()
+
+    # Get player input and move the player
+    move = gb.io.input("Enter your move (w/a/s/d): ").strip().lower()
+    gb.io.print()
+    if move not in MOVES:
+        gb.io.print("Invalid input. Please enter w/a/s/d.")
+        return None
+    return gb.move_player(*MOVES[move])
 
 
 ################################################################################
@@ -77,10 +106,33 @@ def game_loop():
 ################################################################################
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Swamp Adventure")
+    parser.add_argument("--board", default=BOARD_FILE,
+                        help="Board file to play on")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Play a newly generated board, and another "
+                        "each time the game starts over")
+    parser.add_argument("--width", type=int, default=BOARD_WIDTH,
+                        help="Width of generated boards")
+    parser.add_argument("--height", type=int, default=BOARD_HEIGHT,
+                        help="Height of generated boards")
+    args = parser.parse_args()
+
+    if not args.fresh:
+        analysis = analyze_file(args.board, **board_layout(args.board))
+        for problem in analysis.problems:
+            print(f"Board problem: {problem}")
+        if not analysis.solvable:
+            sys.exit("The board cannot be won. Fix it before playing.")
+
     success = False
     while not success:
+        if args.fresh:
+            gb = generate(args.width, args.height).board()
+        else:
+            gb = GameBoard(src=args.board, **board_layout(args.board))
         try:
-            game_loop()
+            game_loop(gb=gb)
             success = True
         except ValueError:
             for _ in range(10):
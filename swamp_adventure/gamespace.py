@@ -39,12 +39,46 @@ GameSpace class
 Represents a cell in the game space. Each cell has a type, coordinates, and
 potentially a function that can be executed when the player enters the cell.
 Each space also contains a flag which dictates whether the player has previously
-visited the space.
+visited the space. The board itself keeps these in flat arrays, so a GameSpace
+is only a lightweight view onto one cell of a board: reading or setting its
+attributes reads or sets the board's arrays at the cell's index, and marks the
+cell's row to be drawn again.
 """
 class GameSpace:
-    def __init__(self, cell_type: CellType, x: int, y: int, action=None):
-        self.cell_type = cell_type
+    __slots__ = ("board", "x", "y", "index")
+
+    def __init__(self, board, x: int, y: int):
+        self.board = board
         self.x = x
         self.y = y
-        self.action = action
-        self.visited = False
+        self.index = x * board.height + y
+
+    @property
+    def cell_type(self):
+        return CellType(self.board.cells[self.index])
+
+    @cell_type.setter
+    def cell_type(self, cell_type: CellType):
+        self.board.cells[self.index] = cell_type.value
+        self.board.dirty.add(self.y)
+        self.board.chase_steps.clear()
+
+    @property
+    def action(self):
+        return self.board.actions.get(self.index)
+
+    @action.setter
+    def action(self, action):
+        if action is None:
+            self.board.actions.pop(self.index, None)
+        else:
+            self.board.actions[self.index] = action
+
+    @property
+    def visited(self):
+        return bool(self.board.visited[self.index])
+
+    @visited.setter
+    def visited(self, visited: bool):
+        self.board.visited[self.index] = visited
+        self.board.dirty.add(self.y)
@@ -0,0 +1,271 @@
+################################################################################
+#                                                                              #
+#  generate.py                                                                 #
+#                                                                              #
+#  This module makes new swamps. It scatters walls over a board of any size,   #
+#  hides the exit behind the wizard, and places the cheese and every other     #
+#  minigame where the player can get to them, so that each team can be given   #
+#  a board nobody has seen before. Every swamp made can be won: a fill out     #
+#  from the start confirms it before the swamp is handed out. Swamps are       #
+#  written as a board file in the init.dat format with a layout file beside    #
+#  it naming where each minigame sits.                                         #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Revised: 06/20/2025                                                         #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import os
+import random
+import time
+from collections import deque
+
+from gameboard import (GameBoard, MINIGAMES, EMPTY, WALL, ACTION,
+                       layout_path)
+from minigames import *
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Chance that any cell is a wall
+WALLS = 0.3
+
+# Layouts tried before generation is given up on
+MAX_TRIES = 100
+
+# Characters written to a board file for each stored cell code
+CELL_CHARS = bytes.maketrans(bytes([EMPTY, WALL, ACTION]), b"EWA")
+
+# Minigames which can be passed, and so may go anywhere the player can reach
+PASSABLE = tuple(game for game in MINIGAMES.values()
+                 if game not in (cheese, cheese_nearby, deadend, wizard))
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+Swamp class
+
+A generated board: its size, the rows of its board file as bytes, one per x,
+and its layout, the minigames by cell and the start and exit cells. board()
+makes a GameBoard to play on it, and save() writes its board and layout files.
+"""
+class Swamp:
+    def __init__(self, width, height, rows, minigames, start, exit):
+        self.width = width
+        self.height = height
+        self.rows = rows
+        self.minigames = minigames
+        self.start = start
+        self.exit = exit
+
+    def layout(self):
+        return {"width": self.width, "height": self.height,
+                "minigames": self.minigames, "start": self.start,
+                "exit": self.exit}
+
+    def board(self, rng=None, io=None):
+        return GameBoard(src=self.rows, rng=rng, io=io, **self.layout())
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(b"\n".join(self.rows))
+        with open(layout_path(path), "w") as f:
+            f.write(f"size {self.width} {self.height}\n"
+                    f"start {self.start[0]} {self.start[1]}\n"
+                    f"exit {self.exit[0]} {self.exit[1]}\n")
+            for (x, y), game in self.minigames.items():
+                f.write(f"{game.__name__} {x} {y}\n")
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+generate(width, height, rng, walls, tries)
+
+Returns a new Swamp of the given size which can be won, drawing every choice
+from rng. Each cell is made a wall with chance walls, and layouts are drawn
+until one passes check(); after tries failures a ValueError is raised, as the
+board is too small or too walled in to hold the game.
+"""
+def generate(width, height, rng=random, walls=WALLS, tries=MAX_TRIES):
+    for _ in range(tries):
+        swamp = attempt(width, height, rng, walls)
+        if swamp is not None:
+            return swamp
+    raise ValueError(f"Could not generate a {width}x{height} swamp")
+
+
+"""
+attempt(width, height, rng, walls)
+
+Draws one layout and returns it as a Swamp, or None if it cannot be won. The
+player starts in the corner and Shrek's starting cell is kept clear. The exit
+is one of the cells furthest from the start, walled in on every side but the
+one it is reached from, where the wizard stands: the player must be sent back
+to the start by his spell before they can walk through to the exit. The cheese
+and the other minigames go in cells reachable without passing the wizard, with
+the dead end in a cell which leads nowhere if there is one.
+"""
+def attempt(width, height, rng, walls):
+    n = width * height
+    cells = bytearray(WALL if rng.random() < walls else EMPTY
+                      for _ in range(n))
+    start = 0
+    shrek = round(width / 2) * height + height - 1
+    if shrek >= n:
+        return None
+    cells[start] = cells[shrek] = EMPTY
+
+    # Hide the exit behind the wizard, in one of the furthest cells
+    dist = flood(cells, width, height, start)
+    reached = sorted((i for i in range(n) if dist[i] >= 2 and i != shrek),
+                     key=dist.__getitem__)
+    if len(reached) < len(MINIGAMES) + 2:
+        return None
+    exit = rng.choice(reached[3 * len(reached) // 4:])
+    gates = [i for i in neighbours(exit, width, height)
+             if dist[i] == dist[exit] - 1 and i != shrek]
+    if not gates:
+        return None
+    gate = rng.choice(gates)
+    for i in neighbours(exit, width, height):
+        if i != gate:
+            if i == shrek:
+                return None
+            cells[i] = WALL
+    cells[gate] = cells[exit] = WALL
+
+    # Place the minigames where they can be reached without the wizard
+    dist = flood(cells, width, height, start)
+    region = [i for i in range(n) if dist[i] > 0 and i != shrek]
+    if len(region) < len(MINIGAMES):
+        return None
+    cells[exit] = EMPTY
+    cells[gate] = ACTION
+    spots = rng.sample(region, len(MINIGAMES) - 1)
+    leaves = [i for i in spots if sum(dist[j] >= 0 for j in
+                                      neighbours(i, width, height)) == 1]
+    dead = rng.choice(leaves) if leaves else spots[-1]
+    spots.remove(dead)
+    food = spots.pop()
+    nearby = [i for i in spots if i in neighbours(food, width, height)]
+    smell = nearby[0] if nearby else spots[-1]
+    spots.remove(smell)
+    placed = {gate: wizard, dead: deadend, food: cheese, smell: cheese_nearby}
+    for i, game in zip(spots, PASSABLE):
+        placed[i] = game
+    for i in placed:
+        cells[i] = ACTION
+
+    if not check(cells, width, height, start, food, gate, dead):
+        return None
+    rows = [bytes(cells[x * height:(x + 1) * height]).translate(CELL_CHARS)
+            for x in range(width)]
+    return Swamp(width, height, rows,
+                 {divmod(i, height): game for i, game in placed.items()},
+                 divmod(start, height), divmod(exit, height))
+
+
+"""
+check(cells, width, height, start, food, gate, dead)
+
+The connectivity check every generated swamp passes. Fills out from the start
+through every cell but walls, the dead end, and the wizard, and confirms that
+the cheese is reached and that the wizard stands next to a cell which is. The
+exit is walled in but for the wizard's side, so once his spell has been cast,
+walking back to him leads out of the swamp.
+"""
+def check(cells, width, height, start, food, gate, dead):
+    blocked = bytearray(cells)
+    blocked[gate] = blocked[dead] = WALL
+    dist = flood(blocked, width, height, start)
+    return dist[food] >= 0 and any(dist[i] >= 0 for i in
+                                   neighbours(gate, width, height))
+
+
+"""
+flood(cells, width, height, start)
+
+Returns the number of steps from the start cell to every cell, around walls,
+as a list indexed by x * height + y, with -1 for cells that cannot be reached.
+"""
+def flood(cells, width, height, start):
+    dist = [-1] * (width * height)
+    dist[start] = 0
+    queue = deque([start])
+    while queue:
+        i = queue.popleft()
+        for j in neighbours(i, width, height):
+            if dist[j] < 0 and cells[j] != WALL:
+                dist[j] = dist[i] + 1
+                queue.append(j)
+    return dist
+
+
+"""
+neighbours(i, width, height)
+
+Returns the indices of the cells beside the cell at index i.
+"""
+def neighbours(i, width, height):
+    x, y = divmod(i, height)
+    found = []
+    if x > 0:
+        found.append(i - height)
+    if x < width - 1:
+        found.append(i + height)
+    if y > 0:
+        found.append(i - 1)
+    if y < height - 1:
+        found.append(i + 1)
+    return found
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+if __name__ == "__main__":
+    from analysis import analyze
+
+    parser = argparse.ArgumentParser(description="Generate new Swamp "
+                                     "Adventure boards")
+    parser.add_argument("--width", type=int, default=10,
+                        help="Width of each board")
+    parser.add_argument("--height", type=int, default=5,
+                        help="Height of each board")
+    parser.add_argument("--walls", type=float, default=WALLS,
+                        help="Chance that any cell is a wall")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Seed to generate from")
+    parser.add_argument("--count", type=int, default=1,
+                        help="Number of boards to generate")
+    parser.add_argument("--out", default=None,
+                        help="Directory to write the boards to; they are "
+                        "only timed if not given")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    begin = time.perf_counter()
+    swamps = [generate(args.width, args.height, rng, args.walls)
+              for _ in range(args.count)]
+    elapsed = time.perf_counter() - begin
+    print(f"{args.count} boards in {elapsed * 1000:.1f} ms, "
+          f"{args.count / elapsed:.0f} boards/s")
+    if args.out is not None:
+        os.makedirs(args.out, exist_ok=True)
+        for number, swamp in enumerate(swamps):
+            path = os.path.join(args.out, f"swamp{number}.dat")
+            analysis = analyze(swamp.board())
+            if not analysis.solvable:
+                raise ValueError(f"Generated board {path} cannot be won")
+            swamp.save(path)
+            print(f"{path}: shortest route {len(analysis.route)} moves")
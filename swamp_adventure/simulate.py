@@ -0,0 +1,349 @@
+################################################################################
+#                                                                              #
+#  simulate.py                                                                 #
+#                                                                              #
+#  This module plays the Swamp Adventure game headlessly, many times over, to  #
+#  see how hard it is. Each game is played by a scripted player with its own   #
+#  seed through the same turns the terminal game takes, and the results of     #
+#  every game are gathered into counts of wins, deaths, turns taken, and       #
+#  meetings with Shrek. Games are spread across a pool of processes.           #
+#                                                                              #
+#  Author: Edward Speer                                                        #
+#  Revised: 06/16/2025                                                         #
+#                                                                              #
+################################################################################
+
+################################################################################
+#  IMPORTS                                                                     #
+################################################################################
+
+import argparse
+import random
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from gameboard import GameBoard, WALL
+from gameio import ScriptedIO
+from gameloop import BOARD_FILE, MOVES, board_layout, take_turn
+
+################################################################################
+#  CONSTANTS                                                                   #
+################################################################################
+
+# Turns after which a game still being played is given up on
+MAX_TURNS = 1000
+
+# Chance a random player gives the right answer to an open question
+INSIGHT = 0.25
+
+# Games played by each task handed to the process pool
+CHUNK = 500
+
+# The keys answering the move prompt
+MOVE_KEYS = "".join(MOVES)
+
+# Answers a player who knows every puzzle gives, by minigame and prompt
+SOLUTIONS = {
+    "pub":             {"Enter 1 or 2": "1", "Choose": "1"},
+    "lily_pads":       {"Enter 1 or 2": "1", "In row": "L"},
+    "troll":           {"Enter 1 or 2": "1", "Enter your answer": "donkey"},
+    "base_three":      {"Enter 1 or 2": "1", "Enter your answer": "0"},
+    "deadend":         {"Enter 1 or 2": "1"},
+    "shrek_encounter": {"Enter 1 or 2": "2", "Enter 1, 2, or 3": "3"},
+}
+
+# Outcomes of a game
+WIN     = "win"
+DEATH   = "death"
+TIMEOUT = "timeout"
+
+################################################################################
+#  CLASS DEFINITIONS                                                           #
+################################################################################
+
+"""
+RandomPlayer class
+
+A player who knows nothing about the game. Given a prompt, it picks one of the
+options the prompt lists at random, and moves in a random direction each turn.
+Open questions, like the troll's riddle, are answered correctly with chance
+insight and wrongly otherwise, so every puzzle is eventually solved. A player
+is the answer callable of a ScriptedIO, and reads the board it plays on, set as
+board once the board is made, to tell which minigame it is in.
+"""
+class RandomPlayer:
+    def __init__(self, rng, insight=INSIGHT):
+        self.board = None
+        self.rng = rng
+        self.insight = insight
+
+    def __call__(self, prompt):
+        choices = options(prompt)
+        if choices is MOVE_KEYS:
+            return self.move()
+        if choices:
+            return self.rng.choice(choices)
+        if self.rng.random() < self.insight:
+            return self.solution(prompt)
+        return "?"
+
+    def move(self):
+        return self.rng.choice(MOVE_KEYS)
+
+    def solution(self, prompt):
+        for start, answer in SOLUTIONS[self.board.scene.__name__].items():
+            if prompt.startswith(start):
+                return answer
+        return self.rng.choice(options(prompt) or "?")
+
+
+"""
+Solver class
+
+A player who knows the answer to every puzzle and the safe choice at every
+prompt, and explores the board: each turn it takes a step along the shortest
+path, through cells it has already seen to be open, to the nearest cell it has
+not seen yet, trying directions in a random order. A minigame it has played
+once counts as seen, even if it was sent back from it, like the dead end. Once
+nothing is left to see it wanders. What is left to chance is the layout it has
+yet to uncover and where Shrek goes.
+"""
+class Solver(RandomPlayer):
+    def __init__(self, rng, insight=INSIGHT):
+        super().__init__(rng, insight)
+        self.played = set()
+
+    def __call__(self, prompt):
+        if options(prompt) is MOVE_KEYS:
+            return self.move()
+        if self.board.scene.__name__ != "shrek_encounter":
+            self.played.add(self.board.player_pos)
+        return self.solution(prompt)
+
+    def move(self):
+        board = self.board
+        steps = self.rng.sample(list(MOVES.items()), len(MOVES))
+        first = {board.player_pos: None}
+        queue = deque([board.player_pos])
+        while queue:
+            x, y = queue.popleft()
+            for key, (dx, dy) in steps:
+                nx, ny = x + dx, y + dy
+                if (not (0 <= nx < board.width and 0 <= ny < board.height) or
+                        (nx, ny) in first):
+                    continue
+                i = nx * board.height + ny
+                step = first[(x, y)] or key
+                if not board.visited[i]:
+                    if (nx, ny) not in self.played:
+                        return step
+                elif board.cells[i] != WALL:
+                    first[(nx, ny)] = step
+                    queue.append((nx, ny))
+        return self.rng.choice(MOVE_KEYS)
+
+
+"""
+Stats class
+
+The results of a number of games. outcomes counts games won, lost to a death,
+and given up on after MAX_TURNS; turns counts, for each outcome, the games which
+ended after each number of turns; encounters counts games by how many times
+Shrek was met; and deaths counts deaths by the minigame, or shrek_encounter, in
+which they happened. Stats from separate processes are combined with merge().
+"""
+class Stats:
+    def __init__(self):
+        self.games = 0
+        self.outcomes = Counter()
+        self.turns = {WIN: Counter(), DEATH: Counter(), TIMEOUT: Counter()}
+        self.encounters = Counter()
+        self.deaths = Counter()
+
+    def add(self, outcome, turns, encounters, cause=None):
+        self.games += 1
+        self.outcomes[outcome] += 1
+        self.turns[outcome][turns] += 1
+        self.encounters[encounters] += 1
+        if cause is not None:
+            self.deaths[cause] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        self.outcomes.update(other.outcomes)
+        for outcome, turns in other.turns.items():
+            self.turns[outcome].update(turns)
+        self.encounters.update(other.encounters)
+        self.deaths.update(other.deaths)
+        return self
+
+    def report(self):
+        lines = [f"games: {self.games}"]
+        for outcome in (WIN, DEATH, TIMEOUT):
+            count = self.outcomes[outcome]
+            line = f"{outcome:<8} {count:>8} {rate(count, self.games):>7}"
+            if count:
+                turns = self.turns[outcome]
+                line += (f"   turns mean {mean(turns):.1f} "
+                         f"p50 {percentile(turns, 50)} "
+                         f"p90 {percentile(turns, 90)} "
+                         f"max {max(turns)}")
+            lines.append(line)
+        met = self.games - self.encounters[0]
+        lines.append(f"met shrek {met:>7} {rate(met, self.games):>7}   "
+                     f"encounters per game {mean(self.encounters):.2f}")
+        for cause, count in self.deaths.most_common():
+            lines.append(f"  died at {cause:<16} {count:>8} "
+                         f"{rate(count, self.outcomes[DEATH]):>7}")
+        return "\n".join(lines)
+
+################################################################################
+#  FUNCTIONS                                                                   #
+################################################################################
+
+"""
+options(prompt)
+
+Returns the answers a prompt offers: the move keys, the lily pads of a row, the
+numbered choices listed, or nothing for a question with an open answer.
+"""
+@lru_cache(maxsize=None)
+def options(prompt):
+    if "w/a/s/d" in prompt:
+        return MOVE_KEYS
+    if prompt.startswith("In row"):
+        return "LMR"
+    return "".join(re.findall(r"\d", prompt))
+
+
+"""
+play(seed, player, insight, src, max_turns)
+
+Plays one game seeded by seed, in which Shrek and the player each draw from
+their own generator, with the named player class. Returns the outcome, the
+turns taken, the number of times Shrek was met, and the cause of death if the
+player died.
+"""
+def play(seed, player="random", insight=INSIGHT, src=BOARD_FILE,
+         max_turns=MAX_TURNS):
+    player = PLAYERS[player](random.Random(f"player/{seed}"), insight)
+    board = GameBoard(src=src, rng=random.Random(f"shrek/{seed}"),
+                      io=ScriptedIO(player), **board_layout(src))
+    player.board = board
+    for turn in range(1, max_turns + 1):
+        try:
+            if take_turn(board):
+                return WIN, turn, board.encounters, None
+        except ValueError:
+            return DEATH, turn, board.encounters, board.scene.__name__
+    return TIMEOUT, max_turns, board.encounters, None
+
+
+"""
+run(seeds, player, insight, src, max_turns)
+
+Plays a game for each of the given seeds and returns their Stats.
+"""
+def run(seeds, player="random", insight=INSIGHT, src=BOARD_FILE,
+        max_turns=MAX_TURNS):
+    stats = Stats()
+    for seed in seeds:
+        stats.add(*play(seed, player, insight, src, max_turns))
+    return stats
+
+
+"""
+simulate(games, seed, player, insight, src, max_turns, workers)
+
+Plays games games, seeded seed, seed + 1, and so on, so the same arguments
+always give the same Stats however the games are split up. With more than one
+worker, the games are played CHUNK at a time across a pool of that many
+processes.
+"""
+def simulate(games, seed=0, player="random", insight=INSIGHT, src=BOARD_FILE,
+             max_turns=MAX_TURNS, workers=1):
+    if workers <= 1:
+        return run(range(seed, seed + games), player, insight, src, max_turns)
+    stats = Stats()
+    chunks = [range(start, min(start + CHUNK, seed + games))
+              for start in range(seed, seed + games, CHUNK)]
+    task = partial(run, player=player, insight=insight, src=src,
+                   max_turns=max_turns)
+    with ProcessPoolExecutor(workers) as pool:
+        for part in pool.map(task, chunks):
+            stats.merge(part)
+    return stats
+
+
+"""
+rate(count, total)
+
+Formats count as a percentage of total.
+"""
+def rate(count, total):
+    return f"{100 * count / total:.1f}%" if total else "-"
+
+
+"""
+mean(counts)
+
+Returns the mean of the values counted in a Counter.
+"""
+def mean(counts):
+    total = sum(counts.values())
+    return sum(k * n for k, n in counts.items()) / total if total else 0
+
+
+"""
+percentile(counts, p)
+
+Returns the smallest value counted in a Counter which at least p percent of the
+counted values are no greater than.
+"""
+def percentile(counts, p):
+    need = sum(counts.values()) * p / 100
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen >= need:
+            return value
+
+################################################################################
+#  GLOBALS                                                                     #
+################################################################################
+
+# Player classes by the name they are chosen with
+PLAYERS = {"random": RandomPlayer, "solver": Solver}
+
+################################################################################
+#  MAIN EXECUTABLE                                                             #
+################################################################################
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Swamp Adventure "
+                                     "headlessly and report how games end")
+    parser.add_argument("--games", type=int, default=10000,
+                        help="Number of games to play")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed of the first game")
+    parser.add_argument("--player", choices=sorted(PLAYERS), default="random",
+                        help="Player who plays every game")
+    parser.add_argument("--insight", type=float, default=INSIGHT,
+                        help="Chance a random player answers a riddle right")
+    parser.add_argument("--board", default=BOARD_FILE,
+                        help="Board file to play on")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS,
+                        help="Turns after which a game is given up on")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes to play games across")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = simulate(args.games, args.seed, args.player, args.insight,
+                     args.board, args.max_turns, args.workers)
+    elapsed = time.perf_counter() - start
+    print(stats.report())
+    print(f"{args.games / elapsed:.0f} games/s")